@@ -1,27 +1,183 @@
+import asyncio
+import json
+import time
+from collections import deque
 from datetime import datetime
-from langchain_ollama import ChatOllama
 from langchain_core.messages import (
     HumanMessage,
     SystemMessage,
 )
 
-from tools.events import schedule_meeting
-from tools.tasks import add_todo
-from langchain_google_genai import ChatGoogleGenerativeAI
+from tools.events import event_body, insert_events, schedule_meeting, store_event
+from tools.tasks import add_todo, insert_tasks, store_task, task_body
+from config import settings
+from chunking import DuplicateFilter, dedupe_tool_calls, split_turns, split_windows
+from fake_llm import FakeChatModel
+from compaction import compact
+from llm_cache import cache_key, create_llm_cache
+from idempotency import create_dispatch_ledger, dispatch_key, transcript_job_id
+from tracing import span
+
+
+def validate_tool_calls(tool_calls):
+    """Return why `tool_calls` do not fit the tool schemas, or None if they do."""
+    for tool_call in tool_calls:
+        try:
+            if tool_call["name"] == "schedule_meeting":
+                event_body(**tool_call["args"])
+            elif tool_call["name"] == "add_todo":
+                task_body(**tool_call["args"])
+            else:
+                return f"unknown tool {tool_call['name']}"
+        except Exception as e:
+            return f"invalid {tool_call['name']} arguments: {e}"
+    return None
+
+
+class LLMTier:
+    def __init__(self, name, llm, model):
+        self.name = name
+        self.model = model
+        # Tool schemas are converted once, not on every request
+        self.bound = llm.bind_tools([schedule_meeting, add_todo])
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class RoutingStats:
+    """Routing decisions, escalations and latency per tier since startup."""
+
+    def __init__(self, window=1000):
+        self.decisions = {}
+        self.escalations = 0
+        self.tiers = {}
+        self.window = window
+
+    def decided(self, route):
+        key = ">".join(tier.name for tier in route)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def record(self, tier, seconds, outcome):
+        stats = self.tiers.setdefault(
+            tier,
+            {"ok": 0, "invalid": 0, "error": 0, "latency": deque(maxlen=self.window)},
+        )
+        stats[outcome] += 1
+        stats["latency"].append(seconds)
+
+    def snapshot(self):
+        tiers = {}
+        for name, stats in self.tiers.items():
+            latency = sorted(stats["latency"])
+            tiers[name] = {
+                "ok": stats["ok"],
+                "invalid": stats["invalid"],
+                "error": stats["error"],
+                "latency_p50": percentile(latency, 0.5),
+                "latency_p95": percentile(latency, 0.95),
+            }
+        return {
+            "decisions": self.decisions,
+            "escalations": self.escalations,
+            "tiers": tiers,
+        }
+
+
+class ModelRouter:
+    """Picks the model tiers to try for a transcript, cheapest first.
+
+    With settings.llm_backend "tiered", short transcripts with few speaker
+    turns go to the local Ollama model first, and are escalated to the remote
+    model when the local one fails or its tool calls do not validate. Long
+    transcripts go to the remote model directly. "remote", "local" and "fake"
+    always use that single backend.
+    """
+
+    def __init__(self, local_model):
+        backend = settings.llm_backend
+        self.tiers = {}
+        # Model clients are imported only for the backends in use; each of
+        # them adds most of a second to startup
+        if backend in ("tiered", "remote"):
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            remote = ChatGoogleGenerativeAI(
+                model=settings.remote_model,
+                temperature=0,
+                max_tokens=None,
+                timeout=None,
+                max_retries=2,
+            )
+            self.tiers["remote"] = LLMTier("remote", remote, settings.remote_model)
+        if backend in ("tiered", "local"):
+            from langchain_ollama import ChatOllama
+
+            local = ChatOllama(
+                model=local_model, base_url=settings.ollama_url, temperature=0.0
+            )
+            self.tiers["local"] = LLMTier("local", local, local_model)
+        if backend == "fake":
+            fake = FakeChatModel(settings.fake_llm_latency_ms)
+            self.tiers["fake"] = LLMTier("fake", fake, fake.model)
+        if not self.tiers:
+            raise ValueError(f"Unknown llm_backend {backend!r}")
+        # Identifies the routing setup in LLM cache keys
+        self.name = f"{backend}:" + ">".join(tier.model for tier in self.tiers.values())
+        self.stats = RoutingStats()
+
+    def route(self, transcript):
+        if len(self.tiers) == 1:
+            return list(self.tiers.values())
+        simple = (
+            len(transcript) <= settings.local_max_chars
+            and len(split_turns(transcript)) <= settings.local_max_turns
+        )
+        if simple:
+            return [self.tiers["local"], self.tiers["remote"]]
+        return [self.tiers["remote"]]
+
+    def streaming_tier(self, transcript):
+        # Streamed tool calls are dispatched before the whole answer exists,
+        # so there is nothing to validate and escalate; use the tier that
+        # would be the last resort
+        tier = self.route(transcript)[-1]
+        self.stats.decided([tier])
+        return tier
+
+    async def ainvoke(self, messages, transcript):
+        """Return the tool calls of the first tier whose output validates."""
+        route = self.route(transcript)
+        self.stats.decided(route)
+        for index, tier in enumerate(route):
+            last = index == len(route) - 1
+            start = time.perf_counter()
+            try:
+                with span(f"llm_{tier.name}"):
+                    result = await tier.bound.ainvoke(messages)
+            except Exception as e:
+                self.stats.record(tier.name, time.perf_counter() - start, "error")
+                if last:
+                    raise
+                print(f"{tier.name} model failed ({e}), escalating")
+                self.stats.escalations += 1
+                continue
+
+            problem = validate_tool_calls(result.tool_calls)
+            elapsed = time.perf_counter() - start
+            self.stats.record(tier.name, elapsed, "invalid" if problem else "ok")
+            print(f"{tier.name} model answered in {elapsed:.2f}s")
+            if problem is None or last:
+                return result.tool_calls
+            print(f"{tier.name} model output rejected ({problem}), escalating")
+            self.stats.escalations += 1
 
 
 class Agent:
     def __init__(self, model):
         self.model_name = model
-        # self.llm = ChatOllama(model=model, temperature=0.0) For local run
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash-preview-05-20",
-            temperature=0,
-            max_tokens=None,
-            timeout=None,
-            max_retries=2,
-            # other params...
-        )
+        self.router = ModelRouter(model)
         self.tools = []
         self.langchain_tools = []
         current_date = datetime.now().strftime("%Y-%m-%d")
@@ -36,38 +192,372 @@ class Agent:
         )
 
         self.messages = [self.system_message]
+        self.cache = create_llm_cache()
+        self.ledger = create_dispatch_ledger()
+        self.compaction_stats = {"requests": 0, "tokens_before": 0, "tokens_after": 0}
+        # Streaming runs that outlive their client
+        self.background = set()
+
+    async def trigger(self, user_query, credentials, user_id, job_id=None):
+        print("triggered with user input:", user_query)
+        with span("extract"):
+            tool_calls = await self.extract(user_query)
+        job_id = job_id or transcript_job_id(user_query)
+        tool_calls, keys = await self.claim(tool_calls, user_id, job_id)
+
+        try:
+            with span("dispatch"):
+                if settings.google_batch_dispatch:
+                    outcomes = await self.dispatch_batched(tool_calls, credentials, user_id)
+                else:
+                    outcomes = await self.dispatch_concurrently(
+                        tool_calls, credentials, user_id
+                    )
+        except BaseException as e:
+            # Nothing is known to be created, so every claim is released and
+            # a retry of the job dispatches the items again
+            await self.settle(keys, [e] * len(keys))
+            raise
+        await self.settle(keys, outcomes)
+
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors:
+            print(f"{len(errors)} of {len(tool_calls)} tool calls failed")
+            raise errors[0]
+
+        return "success_to_process"
+
+    async def claim(self, tool_calls, user_id, job_id):
+        """Keep only the tool calls whose item was not dispatched for this job yet.
+
+        Returns the tool calls to dispatch and their ledger keys.
+        """
+        if self.ledger is None:
+            return tool_calls, [None] * len(tool_calls)
+        keys = [dispatch_key(user_id, job_id, tool_call) for tool_call in tool_calls]
+        claimed = await asyncio.gather(*(self.ledger.claim(key) for key in keys))
+        skipped = claimed.count(False)
+        if skipped:
+            print(f"Skipping {skipped} items already dispatched for job {job_id}")
+        pairs = [pair for pair, ok in zip(zip(tool_calls, keys), claimed) if ok]
+        return [tool_call for tool_call, _ in pairs], [key for _, key in pairs]
+
+    async def settle(self, keys, outcomes):
+        # Failed items are released so a retry of the job creates them
+        if self.ledger is None:
+            return
+        await asyncio.gather(
+            *(
+                self.ledger.release(key)
+                if isinstance(outcome, Exception)
+                else self.ledger.complete(key, (outcome or {}).get("id"))
+                for key, outcome in zip(keys, outcomes)
+            )
+        )
+
+    async def extract(self, transcript):
+        """Return the tool calls for every action item in `transcript`.
 
-    def trigger(self, user_query, credentials, user_id):
+        Transcripts longer than settings.chunk_max_chars are split into
+        overlapping windows on speaker turns, analyzed concurrently, and the
+        tool calls found in more than one window are merged.
+        """
+        if settings.transcript_compaction:
+            transcript = self.compact(transcript)
+            if not transcript:
+                return []
+
+        windows = split_windows(
+            transcript, settings.chunk_max_chars, settings.chunk_overlap_chars
+        )
+        if len(windows) <= 1:
+            return await self.extract_window(transcript)
+
+        print(f"Analyzing transcript in {len(windows)} windows")
+        semaphore = asyncio.Semaphore(settings.chunk_concurrency)
+
+        async def extract(index, window):
+            async with semaphore:
+                return await self.extract_window(window, index + 1, len(windows))
+
+        results = await asyncio.gather(
+            *(extract(index, window) for index, window in enumerate(windows))
+        )
+        tool_calls = [tool_call for result in results for tool_call in result]
+        merged = dedupe_tool_calls(tool_calls)
+        print(f"Merged {len(tool_calls)} tool calls into {len(merged)}")
+        return merged
+
+    def compact(self, transcript):
+        """Drop filler and small talk before the LLM call, counting tokens saved."""
+        result = compact(transcript)
+        stats = self.compaction_stats
+        stats["requests"] += 1
+        stats["tokens_before"] += result.tokens_before
+        stats["tokens_after"] += result.tokens_after
+        print(
+            f"Compacted transcript from {result.tokens_before} to "
+            f"{result.tokens_after} tokens (ratio {result.ratio:.2f})"
+        )
+        return result.text
+
+    def prompt(self, transcript, part=1, parts=1):
+        """Return the window context line and the messages for the LLM."""
         # Format the user input with instructions
+        context = (
+            f"This is part {part} of {parts} of a longer transcript; parts overlap, "
+            "so only extract items discussed in this part.\n"
+            if parts > 1
+            else ""
+        )
         user_input = HumanMessage(
             "Analyze this meeting transcript and identify ALL actionable items. For EACH item:\n"
             "1. If it mentions a meeting or sync (like 'sync with X', 'meet with Y', etc.), call schedule_meeting with appropriate details\n"
             "2. If it mentions tasks, follow-ups, or action items (like 'check with X', 'follow up on Y', etc.), call add_todo for EACH task\n"
             "Make sure to generate SEPARATE tool calls for EACH identified item. Don't combine multiple actions into one tool call.\n"
             "call as many tools as possible.\n"
-            f"Here's the transcript:\n\n{user_query}",
+            f"{context}"
+            f"Here's the transcript:\n\n{transcript}",
         )
-        print("triggered with user input:", user_query)
+        return context, [self.system_message, user_input]
+
+    async def extract_window(self, transcript, part=1, parts=1):
+        context, messages = self.prompt(transcript, part, parts)
+        key = cache_key(self.router.name, self.system_message.content, context, transcript)
+        cached = await self.cached_tool_calls(key)
+        if cached is not None:
+            print(f"Using cached analysis for part {part} of {parts}")
+            return cached
 
         # TODO convert to LangGraph for multiagent (instead of deprecated initialize_agent)
 
         # TODO Consider move to agent executor
-        result = self.llm.bind_tools([schedule_meeting, add_todo]).invoke(
-            [self.system_message, user_input]
+        tool_calls = await self.router.ainvoke(messages, transcript)
+        await self.cache_tool_calls(key, tool_calls)
+        return tool_calls
+
+    async def stream(self, transcript, credentials, user_id, job_id=None):
+        """Yield progress events while action items are extracted and created.
+
+        Each tool call is dispatched as soon as the model has finished
+        emitting it, instead of after the whole answer. Events are dicts with
+        a "type" of "text" (model output), "item" (one action item created,
+        skipped or failed) or "error", followed by a final "done" summary.
+        """
+        job_id = job_id or transcript_job_id(transcript)
+        if settings.transcript_compaction:
+            transcript = self.compact(transcript)
+        windows = (
+            split_windows(transcript, settings.chunk_max_chars, settings.chunk_overlap_chars)
+            if transcript
+            else []
         )
 
-        for tool_call in result.tool_calls:
-            if tool_call["name"] == "schedule_meeting":
-                print("Schedule Meeting:", tool_call["args"])
-                tool_call["args"]["credentials"] = credentials
-                tool_call["args"]["user_id"] = user_id
-                schedule_meeting.invoke(tool_call["args"])
-            elif tool_call["name"] == "add_todo":
-                print("Add Todo:", tool_call["args"])
-                tool_call["args"]["credentials"] = credentials
-                tool_call["args"]["user_id"] = user_id
-                add_todo.invoke(tool_call["args"])
-            else:
-                print(f"Unknown tool call: {tool_call.name}")
+        events = asyncio.Queue()
+        duplicates = DuplicateFilter()
+        window_semaphore = asyncio.Semaphore(settings.chunk_concurrency)
+        tool_semaphore = asyncio.Semaphore(settings.tool_concurrency)
+        dispatches = []
 
-        return "success_to_process"
+        async def dispatch(tool_call):
+            async with tool_semaphore:
+                await events.put(
+                    await self.dispatch_one(tool_call, credentials, user_id, job_id)
+                )
+
+        async def produce(index, window):
+            async with window_semaphore:
+                async for tool_call in self.stream_window(
+                    window, events, index + 1, len(windows)
+                ):
+                    if duplicates.add(tool_call):
+                        dispatches.append(asyncio.create_task(dispatch(tool_call)))
+
+        async def run():
+            try:
+                await asyncio.gather(
+                    *(produce(index, window) for index, window in enumerate(windows))
+                )
+            except Exception as e:
+                print(f"Error streaming transcript analysis: {e}")
+                await events.put({"type": "error", "error": str(e)})
+            await asyncio.gather(*dispatches)
+            await events.put(None)
+
+        # Dispatches in flight finish even if the client disconnects, so
+        # the ledger never keeps claims for items that were not settled
+        runner = asyncio.create_task(run())
+        self.background.add(runner)
+        runner.add_done_callback(self.background.discard)
+
+        counts = {"created": 0, "skipped": 0, "failed": 0}
+        while (event := await events.get()) is not None:
+            if event["type"] == "item":
+                counts[event["status"]] += 1
+            yield event
+        yield {"type": "done", **counts}
+
+    async def stream_window(self, transcript, events, part=1, parts=1):
+        """Yield the tool calls for one window as the model completes them."""
+        context, messages = self.prompt(transcript, part, parts)
+        key = cache_key(self.router.name, self.system_message.content, context, transcript)
+        cached = await self.cached_tool_calls(key)
+        if cached is not None:
+            print(f"Using cached analysis for part {part} of {parts}")
+            for tool_call in cached:
+                yield tool_call
+            return
+
+        tier = self.router.streaming_tier(transcript)
+        start = time.perf_counter()
+        gathered = None
+        tool_calls = []
+
+        def parse(chunk):
+            try:
+                args = json.loads(chunk.get("args") or "{}")
+            except ValueError as e:
+                print(f"Discarding malformed {chunk.get('name')} call: {e}")
+                return None
+            return {
+                "name": chunk.get("name"),
+                "args": args,
+                "id": chunk.get("id"),
+                "type": "tool_call",
+            }
+
+        async for chunk in tier.bound.astream(messages):
+            gathered = chunk if gathered is None else gathered + chunk
+            if isinstance(chunk.content, str) and chunk.content:
+                await events.put({"type": "text", "content": chunk.content})
+            # A tool call is complete once the model has started the next one
+            chunks = gathered.tool_call_chunks
+            while len(tool_calls) < len(chunks) - 1:
+                tool_call = parse(chunks[len(tool_calls)])
+                tool_calls.append(tool_call)
+                if tool_call:
+                    yield tool_call
+        if gathered is not None:
+            for chunk in gathered.tool_call_chunks[len(tool_calls) :]:
+                tool_call = parse(chunk)
+                tool_calls.append(tool_call)
+                if tool_call:
+                    yield tool_call
+
+        tool_calls = [tool_call for tool_call in tool_calls if tool_call]
+        self.router.stats.record(tier.name, time.perf_counter() - start, "ok")
+        await self.cache_tool_calls(key, tool_calls)
+
+    async def dispatch_one(self, tool_call, credentials, user_id, job_id):
+        """Create one action item and describe the outcome as an "item" event."""
+        args = tool_call["args"]
+        event = {
+            "type": "item",
+            "tool": tool_call["name"],
+            "title": args.get("summary") or args.get("title"),
+        }
+        if tool_call["name"] not in ("schedule_meeting", "add_todo"):
+            return {**event, "status": "failed", "error": "unknown tool"}
+        key = dispatch_key(user_id, job_id, tool_call) if self.ledger else None
+        if key and not await self.ledger.claim(key):
+            return {**event, "status": "skipped"}
+
+        # Dispatch adds the credentials to the arguments, so it gets a copy
+        tool_call = {**tool_call, "args": dict(args)}
+        [outcome] = await self.dispatch_concurrently([tool_call], credentials, user_id)
+        if key:
+            await self.settle([key], [outcome])
+        if isinstance(outcome, Exception):
+            return {**event, "status": "failed", "error": str(outcome)}
+        outcome = outcome or {}
+        return {
+            **event,
+            "status": "created",
+            "id": outcome.get("id"),
+            "link": outcome.get("htmlLink") or outcome.get("webViewLink"),
+        }
+
+    async def cached_tool_calls(self, key):
+        # A cache failure only costs an LLM call, so it never fails the request
+        if self.cache is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.cache.get, key)
+        except Exception as e:
+            print(f"LLM cache lookup failed: {e}")
+            return None
+
+    async def cache_tool_calls(self, key, tool_calls):
+        if self.cache is None:
+            return
+        try:
+            await asyncio.to_thread(self.cache.set, key, tool_calls)
+        except Exception as e:
+            print(f"LLM cache update failed: {e}")
+
+    async def dispatch_concurrently(self, tool_calls, credentials, user_id):
+        """Invoke each tool on its own, at most settings.tool_concurrency at a time.
+
+        Returns one outcome per tool call: the created resource, None for an
+        unknown tool, or the exception it raised.
+        """
+        semaphore = asyncio.Semaphore(settings.tool_concurrency)
+
+        async def dispatch(tool_call):
+            tools = {"schedule_meeting": schedule_meeting, "add_todo": add_todo}
+            selected = tools.get(tool_call["name"])
+            if selected is None:
+                print(f"Unknown tool call: {tool_call['name']}")
+                return None
+            print(f"{tool_call['name']}:", tool_call["args"])
+            tool_call["args"]["credentials"] = credentials
+            tool_call["args"]["user_id"] = user_id
+            async with semaphore:
+                return await selected.ainvoke(tool_call["args"])
+
+        return await asyncio.gather(
+            *(dispatch(tool_call) for tool_call in tool_calls),
+            return_exceptions=True,
+        )
+
+    async def dispatch_batched(self, tool_calls, credentials, user_id):
+        """Create all events, and all tasks, with one Google batch request each.
+
+        Returns outcomes like `dispatch_concurrently`; a failing item does not
+        stop the others from being created and queued for storage.
+        """
+        outcomes = [None] * len(tool_calls)
+        events, tasks = [], []
+        for index, tool_call in enumerate(tool_calls):
+            print(f"{tool_call['name']}:", tool_call["args"])
+            try:
+                if tool_call["name"] == "schedule_meeting":
+                    events.append((index, event_body(**tool_call["args"])))
+                elif tool_call["name"] == "add_todo":
+                    tasks.append((index, task_body(**tool_call["args"])))
+                else:
+                    print(f"Unknown tool call: {tool_call['name']}")
+            except Exception as e:
+                outcomes[index] = e
+
+        created_events, created_tasks = await asyncio.gather(
+            insert_events(credentials, [body for _, body in events]),
+            insert_tasks(credentials, [body for _, body in tasks]),
+            return_exceptions=True,
+        )
+
+        for items, created, store in [
+            (events, created_events, store_event),
+            (tasks, created_tasks, store_task),
+        ]:
+            if isinstance(created, Exception):
+                # The whole batch request failed; none of its items exist
+                print(f"Batch insert failed: {created}")
+                created = [created] * len(items)
+            for (index, _), item in zip(items, created):
+                outcomes[index] = item
+                if not isinstance(item, Exception):
+                    store(item, user_id)
+        created = [o for o in outcomes if o is not None and not isinstance(o, Exception)]
+        print(f"Created {len(created)} of {len(tool_calls)} events and tasks")
+        return outcomes
@@ -1,42 +1,193 @@
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from config import settings
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+import asyncio
+import json
+import time
 
 import requests
 
+from clients import get_http_client
+
 CLIENT_ID = settings.google_client_id
 CLIENT_SECRET = settings.google_client_secret
 CLIENT_SECRETS_FILE = "client_secret.json"  # Path to OAuth client secrets JSON
 TOKEN_FILE = "token.pickle"  # Path to store user tokens
 TOKEN_URI = "https://oauth2.googleapis.com/token"
+AUTH_SERVICE_URL = "http://auth:4000"
 
+SHARED_CACHE_PREFIX = "ai-logic:credentials:"
 
-def get_credentials(user_id: str) -> Optional[Credentials]:
-    """Get valid user credentials from storage or return None."""
-    print("Getting credentials for user:", user_id)
-    data = requests.get(f"http://auth:4000/users/{user_id}/token")
-    if data.status_code == 200:
-        print("Credentials fetched successfully.")
-        access_token = data.json().get("accessToken")
-        refresh_token = data.json().get("refreshToken")
-        if access_token:
-            # Load the credentials from the token
-            print(access_token)
-            print(refresh_token)
-            creds = Credentials(
-                token=access_token,
-                refresh_token=refresh_token,
-                token_uri=TOKEN_URI,
-                client_id=CLIENT_ID,
-                client_secret=CLIENT_SECRET,
-                scopes=settings.SCOPES,
-            )
-            print("Credentials loaded successfully.")
-            print("Credentials:", creds)
-            return creds
-        else:
-            print("No access token found in response.")
-            return None
-    else:
+# Token refreshes against Google reuse one pooled session
+_google_session = requests.Session()
+
+# user id -> (credentials, time they were fetched)
+_cache: Dict[str, Tuple[Credentials, float]] = {}
+# user id -> lookup in progress, awaited by every concurrent caller
+_lookups: Dict[str, asyncio.Task] = {}
+_shared_cache = None
+
+
+def _build_credentials(token, refresh_token, expiry=None) -> Credentials:
+    creds = Credentials(
+        token=token,
+        refresh_token=refresh_token,
+        token_uri=TOKEN_URI,
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        scopes=settings.SCOPES,
+    )
+    # google-auth keeps expiry as a naive UTC datetime
+    creds.expiry = expiry
+    return creds
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _seconds_left(creds: Credentials, fetched_at: float) -> float:
+    if creds.expiry is not None:
+        return (creds.expiry - _utcnow()).total_seconds()
+    return fetched_at + settings.credential_unverified_ttl - time.time()
+
+
+def _get_shared_cache():
+    global _shared_cache
+    if _shared_cache is None and settings.credential_cache_url:
+        import redis.asyncio as redis
+
+        _shared_cache = redis.Redis.from_url(
+            settings.credential_cache_url, decode_responses=True
+        )
+    return _shared_cache
+
+
+async def _load_shared(user_id: str) -> Optional[Tuple[Credentials, float]]:
+    shared = _get_shared_cache()
+    if shared is None:
+        return None
+    try:
+        data = await shared.get(SHARED_CACHE_PREFIX + user_id)
+    except Exception as e:
+        print(f"Shared credential cache unavailable: {e}")
+        return None
+    if not data:
+        return None
+    entry = json.loads(data)
+    expiry = entry.get("expiry")
+    # Refresh tokens are never shared; keep this process's own, if it has one
+    local = _cache.get(user_id)
+    creds = _build_credentials(
+        entry["token"],
+        local[0].refresh_token if local else None,
+        datetime.fromisoformat(expiry) if expiry else None,
+    )
+    return creds, entry["fetched_at"]
+
+
+async def _store(user_id: str, creds: Credentials, fetched_at: float) -> None:
+    _cache[user_id] = (creds, fetched_at)
+    shared = _get_shared_cache()
+    ttl = int(_seconds_left(creds, fetched_at))
+    if shared is None or ttl <= 0:
+        return
+    # Only the short-lived access token is shared. Users' refresh tokens
+    # stay with the auth service, which hands them out on a cache miss.
+    entry = {
+        "token": creds.token,
+        "expiry": creds.expiry.isoformat() if creds.expiry else None,
+        "fetched_at": fetched_at,
+    }
+    try:
+        await shared.set(SHARED_CACHE_PREFIX + user_id, json.dumps(entry), ex=ttl)
+    except Exception as e:
+        print(f"Shared credential cache unavailable: {e}")
+
+
+async def _fetch(user_id: str) -> Optional[Credentials]:
+    """Fetch the user's tokens from the auth service."""
+    data = await get_http_client().get(f"{AUTH_SERVICE_URL}/users/{user_id}/token")
+    if data.status_code != 200:
         print(f"Failed to fetch credentials: {data.status_code} - {data.text}")
         return None
+    access_token = data.json().get("accessToken")
+    if not access_token:
+        print("No access token found in response.")
+        return None
+    print("Credentials fetched successfully.")
+    return _build_credentials(access_token, data.json().get("refreshToken"))
+
+
+async def _refresh(creds: Credentials) -> Optional[Credentials]:
+    """Exchange the refresh token with Google, which also reveals the expiry."""
+    refreshed = _build_credentials(None, creds.refresh_token)
+    try:
+        await asyncio.to_thread(refreshed.refresh, Request(_google_session))
+    except RefreshError as e:
+        print(f"Failed to refresh credentials: {e}")
+        return None
+    return refreshed
+
+
+async def _lookup(user_id: str) -> Optional[Credentials]:
+    margin = settings.credential_refresh_margin
+    shared = await _load_shared(user_id)
+    if shared and _seconds_left(*shared) > margin:
+        _cache[user_id] = shared
+        return shared[0]
+
+    current = _cache.get(user_id) or shared
+    if current and current[0].refresh_token:
+        refreshed = await _refresh(current[0])
+        if refreshed:
+            await _store(user_id, refreshed, time.time())
+            return refreshed
+
+    creds = await _fetch(user_id)
+    if creds is None:
+        _cache.pop(user_id, None)
+        return None
+    await _store(user_id, creds, time.time())
+    return creds
+
+
+def _start_lookup(user_id: str) -> asyncio.Task:
+    task = _lookups.get(user_id)
+    if task is None:
+        task = asyncio.create_task(_lookup(user_id))
+        _lookups[user_id] = task
+
+        def done(task):
+            _lookups.pop(user_id, None)
+            if not task.cancelled() and task.exception():
+                print(f"Credential lookup failed: {task.exception()}")
+
+        task.add_done_callback(done)
+    return task
+
+
+async def get_credentials(user_id: str) -> Optional[Credentials]:
+    """Get valid user credentials from the cache or the auth service, or None.
+
+    Credentials are cached per user until shortly before they expire; inside
+    `settings.credential_refresh_margin` the cached ones are still returned
+    while a refresh runs in the background. Concurrent lookups for the same
+    user share one request.
+    """
+    print("Getting credentials for user:", user_id)
+    entry = _cache.get(user_id)
+    if entry:
+        seconds_left = _seconds_left(*entry)
+        if seconds_left > 0:
+            if seconds_left < settings.credential_refresh_margin:
+                _start_lookup(user_id)
+            return entry[0]
+
+    # Shielded so a cancelled request does not cancel the lookup other
+    # callers are waiting on
+    return await asyncio.shield(_start_lookup(user_id))
@@ -0,0 +1,156 @@
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+# "Danny:", "Mia (Data Scientist):", "Scrum Master:" at the start of a line
+SPEAKER_PATTERN = re.compile(r"^\s*[A-Z][\w.'’ -]{0,40}(?:\([^)\n]{0,60}\))?:\s")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Titles of the same tool and day at least this similar are the same item
+DUPLICATE_SIMILARITY = 0.85
+
+
+def split_turns(transcript: str) -> List[str]:
+    """Split a transcript into speaker turns.
+
+    A line starting with a speaker label opens a new turn; other lines belong
+    to the current one. STT output has no labels, so it falls back to
+    sentences and blank-line separated paragraphs.
+    """
+    turns: List[str] = []
+    current: List[str] = []
+    labelled = False
+    for line in transcript.splitlines():
+        if SPEAKER_PATTERN.match(line):
+            labelled = True
+            if current:
+                turns.append("\n".join(current).strip())
+            current = [line]
+        elif line.strip() or current:
+            current.append(line)
+    if current:
+        turns.append("\n".join(current).strip())
+    turns = [turn for turn in turns if turn]
+
+    if labelled:
+        return turns
+    return [s for turn in turns for s in SENTENCE_END.split(turn) if s.strip()]
+
+
+def _cut_words(text: str, max_chars: int) -> List[str]:
+    # Cut at the last space that fits, or mid-word when a word alone is too long
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 1, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _split_long(turn: str, max_chars: int) -> List[str]:
+    # A turn longer than a window is cut between sentences, or between words
+    # when a sentence alone is too long, as in unpunctuated STT output
+    pieces, current = [], ""
+    for sentence in SENTENCE_END.split(turn):
+        for part in _cut_words(sentence, max_chars):
+            if current and len(current) + 1 + len(part) > max_chars:
+                pieces.append(current)
+                current = part
+            else:
+                current = f"{current} {part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_windows(transcript: str, max_chars: int, overlap_chars: int) -> List[str]:
+    """Pack speaker turns into windows of at most `max_chars`.
+
+    Each window repeats the last turns of the previous one, up to
+    `overlap_chars`, so an action item discussed across a boundary is seen
+    whole by at least one window.
+
+    Turns longer than a window are cut into pieces of a third of the overlap,
+    so consecutive windows still share text inside a long monologue.
+    """
+    piece_chars = min(max_chars, overlap_chars // 3) or max_chars
+    turns = []
+    for turn in split_turns(transcript):
+        turns.extend(_split_long(turn, piece_chars) if len(turn) > max_chars else [turn])
+
+    # Sizes include the blank line joining turns
+    windows: List[List[str]] = []
+    current: List[str] = []
+    size = 0
+    for turn in turns:
+        cost = len(turn) + 2
+        if current and size + cost > max_chars + 2:
+            windows.append(current)
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                if overlap_size + len(previous) + 2 > overlap_chars:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += len(previous) + 2
+            # The overlap must leave room for the new turn
+            while overlap and overlap_size + cost > max_chars + 2:
+                overlap_size -= len(overlap.pop(0)) + 2
+            current, size = overlap, overlap_size
+        current.append(turn)
+        size += cost
+    if current:
+        windows.append(current)
+    return ["\n\n".join(window) for window in windows]
+
+
+def _normalize(text: Any) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
+
+
+def _day(value: Any) -> str:
+    if isinstance(value, dict):
+        value = value.get("dateTime") or value.get("date")
+    return str(value or "")[:10]
+
+
+def item_identity(tool_call: Dict[str, Any]):
+    """Normalized (title, day) describing the action item of a tool call."""
+    args = tool_call["args"]
+    if tool_call["name"] == "schedule_meeting":
+        return _normalize(args.get("summary")), _day(args.get("start"))
+    return _normalize(args.get("title")), _day(args.get("due"))
+
+
+class DuplicateFilter:
+    """Recognizes tool calls that repeat an earlier one, e.g. from overlapping
+    windows.
+
+    Two calls are the same item when they use the same tool on the same day
+    and their titles are nearly identical after normalization.
+    """
+
+    def __init__(self):
+        self.seen: Dict[tuple, List[str]] = {}
+
+    def add(self, tool_call: Dict[str, Any]) -> bool:
+        """Record `tool_call`; return False if it duplicates an earlier one."""
+        title, day = item_identity(tool_call)
+        titles = self.seen.setdefault((tool_call["name"], day), [])
+        if any(
+            SequenceMatcher(None, title, other).ratio() >= DUPLICATE_SIMILARITY
+            for other in titles
+        ):
+            return False
+        titles.append(title)
+        return True
+
+
+def dedupe_tool_calls(tool_calls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop tool calls that repeat an earlier one; see `DuplicateFilter`."""
+    duplicates = DuplicateFilter()
+    return [tool_call for tool_call in tool_calls if duplicates.add(tool_call)]
@@ -0,0 +1,32 @@
+from typing import Optional
+
+import httpx
+
+from tracing import CORRELATION_HEADER, correlation_id
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+async def _propagate_correlation_id(request: httpx.Request) -> None:
+    value = correlation_id.get()
+    if value and CORRELATION_HEADER not in request.headers:
+        request.headers[CORRELATION_HEADER] = value
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for calls to the auth and storage services."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            event_hooks={"request": [_propagate_correlation_id]},
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,131 @@
+import re
+from typing import NamedTuple
+
+from chunking import SENTENCE_END, SPEAKER_PATTERN, split_turns
+
+# Rough token count: words and punctuation marks, which tracks LLM tokenizers
+# closely enough to compare prompt sizes
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+FILLER_PATTERN = re.compile(
+    r"(?:,\s*)?\b(?:um+|uh+|uhm+|erm+|hmm+|you know|i mean|basically|"
+    r"kind of|sort of)\b,?\s*",
+    re.IGNORECASE,
+)
+PLEASANTRY = (
+    r"(?:good morning|morning|hi|hello|hey|thanks|thank you|great|nice|perfect|"
+    r"awesome|cool|sounds good|noted|understood|got it|see you|bye|"
+    r"(?:that[’']s )?(?:great|good|nice) (?:work|job|progress)|well done)"
+    r"(?:[ ,]+(?:everyone|all|again|so much|tomorrow))*"
+)
+# Sentences made up of nothing but pleasantries, like "Thanks!" or
+# "Great, sounds good." Anything else in the sentence keeps it.
+SMALL_TALK_PATTERN = re.compile(
+    rf"{PLEASANTRY}(?:[\s,.!]+{PLEASANTRY})*[\s,.!]*", re.IGNORECASE
+)
+# Stand-up routine: handing the turn to someone and the stock questions
+# asked of each speaker, whose answers carry the content
+ROUTINE_PATTERN = re.compile(
+    r"(?:[A-Z]\w*, )?(?:your turn|you[’']re up next|let[’']s start with you|"
+    r"what[’']s (?:the plan|the focus|your focus|your plan) for today|"
+    r"any blockers(?: on your end)?|let[’']s have a productive day)[.!?]*",
+    re.IGNORECASE,
+)
+# A pleasantry set off at the start of a sentence, as in "Thanks, please..."
+LEADING_PLEASANTRY = re.compile(rf"{PLEASANTRY}[,!]\s+(?=\w)", re.IGNORECASE)
+LABEL_ROLE = re.compile(r"^\s*([^:(]+?)\s*\([^)]*\)\s*:")
+
+
+class Compaction(NamedTuple):
+    text: str
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def ratio(self) -> float:
+        return self.tokens_after / self.tokens_before if self.tokens_before else 1.0
+
+
+def count_tokens(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _speaker(turn: str):
+    match = SPEAKER_PATTERN.match(turn)
+    if not match:
+        return None, turn
+    label = match.group(0).strip()[:-1]
+    name = re.sub(r"\s*\([^)]*\)", "", label).strip()
+    return name, turn[match.end() :]
+
+
+def _is_small_talk(sentence: str) -> bool:
+    return (
+        SMALL_TALK_PATTERN.fullmatch(sentence) is not None
+        or ROUTINE_PATTERN.fullmatch(sentence) is not None
+    )
+
+
+def _strip(content: str) -> str:
+    content = " ".join(FILLER_PATTERN.sub(" ", content).split())
+    sentences = SENTENCE_END.split(content)
+    return " ".join(
+        LEADING_PLEASANTRY.sub("", s, count=1)
+        for s in sentences
+        if s and not _is_small_talk(s)
+    )
+
+
+def compact(transcript: str) -> Compaction:
+    """Shrink a transcript before it is sent to the LLM.
+
+    Filler words, sentences that are nothing but pleasantries or stand-up
+    routine, and pleasantries opening a sentence are removed. Turns left
+    empty are dropped, consecutive turns of the same speaker are merged, and
+    speaker roles are kept only on each speaker's first turn.
+    """
+    turns = []
+    introduced = set()
+    previous = None
+    for turn in split_turns(transcript):
+        speaker, content = _speaker(turn)
+        content = _strip(content)
+        if not content:
+            continue
+        if speaker is None:
+            turns.append(content)
+            previous = None
+            continue
+        if speaker == previous:
+            turns[-1] += f" {content}"
+            continue
+        label = speaker
+        role = LABEL_ROLE.match(turn)
+        if role and speaker not in introduced:
+            label = turn[: turn.index(":")].strip()
+        introduced.add(speaker)
+        turns.append(f"{label}: {content}")
+        previous = speaker
+
+    # Labelled transcripts keep one turn per paragraph; plain STT text is
+    # rejoined into running prose
+    labelled = any(SPEAKER_PATTERN.match(turn) for turn in turns)
+    text = ("\n\n" if labelled else " ").join(turns)
+    return Compaction(text, count_tokens(transcript), count_tokens(text))
+
+
+if __name__ == "__main__":
+    # Regression check against hand-labelled transcripts: prints the savings
+    # and fails if any labelled action item was lost
+    from compaction_samples import SAMPLES
+
+    lost = []
+    for name, transcript, action_items in SAMPLES:
+        result = compact(transcript)
+        print(
+            f"{name}: {result.tokens_before} -> {result.tokens_after} tokens "
+            f"({1 - result.ratio:.0%} smaller)"
+        )
+        flattened = " ".join(result.text.split())
+        lost += [f"{name}: {item}" for item in action_items if item not in flattened]
+    assert not lost, "lost action items:\n" + "\n".join(lost)
@@ -0,0 +1,74 @@
+"""Transcripts with hand-labelled action items for the compaction check.
+
+Each sample is (name, transcript, action items). An action item is a phrase
+that states the work, and must survive `compaction.compact` word for word.
+"""
+from daily import daily
+
+REQUESTS = """
+Danny: Can you deploy the hotfix to production by Friday?
+
+Mia: Sure.
+
+Danny: Could you update the onboarding docs?
+
+Roy: Thanks, please file the bug against the payments team.
+
+Danny: Great, Mia owns the rollout plan.
+
+Mia: Thanks!
+"""
+
+STT_OUTPUT = (
+    "hi everyone thanks for joining um so the migration is done "
+    "can someone rotate the staging credentials "
+    "great job on the release by the way "
+    "Roy please book a room for the retro "
+    "cool sounds good "
+    "who is taking the customer call on Tuesday "
+    "I can take it and send the notes after "
+    "thanks bye"
+)
+
+SAMPLES = [
+    (
+        "daily",
+        daily,
+        [
+            "I’ll be working on integrating new log data into the pipeline",
+            "I’ll need some DevOps support later in the day",
+            "I’ll help coordinate with DevOps",
+            "I’m still waiting for access to production data from the DBA",
+            "If I don’t get it by noon, I may need to escalate.",
+            "I’ll check in with IT and see if we can speed that up.",
+            "I need to sync with Danny at some point",
+            "let’s set up a quick sync after this call.",
+            "Danny, you’ll sync with Roy to validate the dataset",
+            "Mia, follow up on the DBA request before noon",
+            "I’ll also reach out to IT to help push it forward.",
+            "Roy, incorporate the product team’s feedback and refine the dashboard filters.",
+            "I’ll check in with the DBA and DevOps after this meeting",
+            "If anything urgent comes up, just ping me.",
+        ],
+    ),
+    (
+        "requests",
+        REQUESTS,
+        [
+            "Can you deploy the hotfix to production by Friday?",
+            "Could you update the onboarding docs?",
+            "please file the bug against the payments team.",
+            "Mia owns the rollout plan.",
+        ],
+    ),
+    (
+        "stt_output",
+        STT_OUTPUT,
+        [
+            "can someone rotate the staging credentials",
+            "Roy please book a room for the retro",
+            "who is taking the customer call on Tuesday",
+            "I can take it and send the notes after",
+        ],
+    ),
+]
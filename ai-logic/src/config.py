@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from typing import Optional
 
 
 class Settings(BaseSettings):
@@ -9,6 +10,66 @@ class Settings(BaseSettings):
     google_client_id: str
     google_client_secret: str
 
+    # Transcripts analyzed at the same time within one /process/batch request
+    batch_concurrency: int = 4
+    # Google/storage tool calls dispatched at the same time for one transcript
+    tool_concurrency: int = 8
+    # Model backend: "remote" (Gemini), "local" (Ollama), "tiered" (local
+    # first for short transcripts, escalating to remote) or "fake" (offline)
+    llm_backend: str = "remote"
+    remote_model: str = "gemini-2.5-flash-preview-05-20"
+    local_model: str = "llama3.1"
+    ollama_url: str = "http://ollama:11434"
+    # Transcripts up to this size and number of speaker turns try local first
+    local_max_chars: int = 4000
+    local_max_turns: int = 30
+    fake_llm_latency_ms: int = 0
+
+    # Strip filler words and small talk from transcripts before the LLM call.
+    # Off until `python compaction.py` passes on samples of real transcripts.
+    transcript_compaction: bool = False
+
+    # Transcripts longer than this are analyzed in overlapping windows
+    chunk_max_chars: int = 12000
+    chunk_overlap_chars: int = 1500
+    # Windows of one transcript analyzed at the same time
+    chunk_concurrency: int = 4
+    # LLM results cache: "local", "redis" or "none"
+    llm_cache: str = "local"
+    llm_cache_dir: str = "/tmp/llm-cache"
+    llm_cache_url: str = "redis://redis:6379/0"
+    llm_cache_max_bytes: int = 64 * 1024 * 1024
+    llm_cache_ttl: int = 7 * 24 * 60 * 60
+    # Record dispatched action items so retries skip them: "memory", "redis"
+    # or "none"; claims of items still being created expire after the pending TTL
+    dispatch_ledger: str = "memory"
+    dispatch_ledger_url: str = "redis://redis:6379/0"
+    dispatch_ledger_ttl: int = 30 * 24 * 60 * 60
+    dispatch_pending_ttl: int = 600
+    # Send all events/tasks of one transcript as Google batch HTTP requests
+    google_batch_dispatch: bool = True
+    # Built Calendar/Tasks API clients kept per access token
+    google_service_cache_size: int = 256
+
+    # Created events/tasks are written to storage in bulk, once this many are
+    # buffered or after the interval (seconds)
+    storage_url: str = "http://storage:3000"
+    storage_batch_size: int = 50
+    storage_flush_interval: float = 1.0
+    storage_max_retries: int = 5
+    storage_retry_backoff: float = 0.5
+    # Items kept for later flushes while the storage service is down
+    storage_buffer_limit: int = 10000
+
+    # Cached credentials are refreshed this many seconds before they expire
+    credential_refresh_margin: int = 300
+    # The auth service does not report token expiry; such tokens are trusted
+    # for this many seconds before being refreshed with Google. Must exceed
+    # the refresh margin, or every fetched token is refreshed right away.
+    credential_unverified_ttl: int = 900
+    # Redis URL for sharing access tokens between ai-logic replicas (optional)
+    credential_cache_url: Optional[str] = None
+
     # Google API scopes
     SCOPES: list[str] = [
         "https://www.googleapis.com/auth/calendar",
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+MEETING_PATTERN = re.compile(r"\b(sync|meet|meeting|call|catch up)\b", re.IGNORECASE)
+TASK_PATTERN = re.compile(
+    r"\b(i'll|i will|follow up|check with|need to|make sure|action item)\b", re.IGNORECASE
+)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+TRANSCRIPT_MARKER = "Here's the transcript:"
+
+
+class FakeChatModel:
+    """Offline stand-in for a chat model, for tests and benchmarks.
+
+    Instead of calling a model it scans the transcript for meeting and task
+    phrases and returns one deterministic tool call per matching sentence,
+    after `latency_ms` of simulated model time.
+    """
+
+    model = "fake"
+
+    def __init__(self, latency_ms: int = 0):
+        self.latency_ms = latency_ms
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self.respond(messages)
+
+    def invoke(self, messages):
+        return self.respond(messages)
+
+    async def astream(self, messages):
+        """Yield the tool calls one chunk at a time, spreading the latency."""
+        tool_calls = self.respond(messages).tool_calls
+        for index, tool_call in enumerate(tool_calls):
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000 / len(tool_calls))
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {
+                        "name": tool_call["name"],
+                        "args": json.dumps(tool_call["args"]),
+                        "id": tool_call["id"],
+                        "index": index,
+                    }
+                ],
+            )
+
+    def respond(self, messages) -> AIMessage:
+        prompt = messages[-1].content
+        transcript = prompt.split(TRANSCRIPT_MARKER, 1)[-1]
+        day = (datetime.now(timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        tool_calls = []
+        for sentence in SENTENCE_END.split(transcript):
+            sentence = " ".join(sentence.split())
+            if MEETING_PATTERN.search(sentence):
+                name = "schedule_meeting"
+                args = {
+                    "summary": sentence[:80],
+                    "location": "",
+                    "description": sentence,
+                    "start": {"dateTime": f"{day}T10:00:00Z", "timeZone": "UTC"},
+                    "end": {"dateTime": f"{day}T10:30:00Z", "timeZone": "UTC"},
+                }
+            elif TASK_PATTERN.search(sentence):
+                name = "add_todo"
+                args = {"title": sentence[:80], "notes": sentence, "due": f"{day}T17:00:00Z"}
+            else:
+                continue
+            tool_calls.append(
+                {"name": name, "args": args, "id": f"fake-{len(tool_calls)}", "type": "tool_call"}
+            )
+        return AIMessage(content="", tool_calls=tool_calls)
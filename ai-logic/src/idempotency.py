@@ -0,0 +1,129 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, Optional
+
+from chunking import item_identity
+from config import settings
+
+
+def transcript_job_id(transcript: str) -> str:
+    """Job id for callers that send none: the whitespace-normalized transcript."""
+    normalized = " ".join(transcript.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def dispatch_key(user_id: str, job_id: str, tool_call: Dict[str, Any]) -> str:
+    """Stable key of one action item of one job, however the LLM phrased it."""
+    title, day = item_identity(tool_call)
+    material = json.dumps([user_id, job_id, tool_call["name"], title, day])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class DispatchLedger:
+    """Records which action items were already created in Google.
+
+    An item is claimed before its tool runs, then either completed with the
+    created resource id or released so a retry can try again. Claims expire
+    after `settings.dispatch_pending_ttl`, so an item whose worker died is
+    not blocked forever. A store failure lets the item through: a possible
+    duplicate is better than a lost action item.
+    """
+
+    async def claim(self, key: str) -> bool:
+        """Return True if the item should be dispatched by this caller."""
+        try:
+            return await self._claim(key)
+        except Exception as e:
+            print(f"Dispatch ledger unavailable: {e}")
+            return True
+
+    async def complete(self, key: str, resource_id: Optional[str]) -> None:
+        try:
+            await self._complete(key, resource_id)
+        except Exception as e:
+            print(f"Dispatch ledger unavailable: {e}")
+
+    async def release(self, key: str) -> None:
+        try:
+            await self._release(key)
+        except Exception as e:
+            print(f"Dispatch ledger unavailable: {e}")
+
+    async def _claim(self, key):
+        raise NotImplementedError
+
+    async def _complete(self, key, resource_id):
+        raise NotImplementedError
+
+    async def _release(self, key):
+        raise NotImplementedError
+
+
+class MemoryLedger(DispatchLedger):
+    """Per-process ledger for single-replica deployments."""
+
+    def __init__(self, pending_ttl: int, ttl: int):
+        self.pending_ttl = pending_ttl
+        self.ttl = ttl
+        # key -> (resource id or None while pending, expiry time)
+        self.entries: Dict[str, tuple] = {}
+        self.claims = 0
+
+    async def _claim(self, key):
+        now = time.monotonic()
+        self.claims += 1
+        if self.claims % 1000 == 0:
+            self.entries = {k: v for k, v in self.entries.items() if v[1] > now}
+        entry = self.entries.get(key)
+        if entry and entry[1] > now:
+            return False
+        self.entries[key] = (None, now + self.pending_ttl)
+        return True
+
+    async def _complete(self, key, resource_id):
+        self.entries[key] = (resource_id, time.monotonic() + self.ttl)
+
+    async def _release(self, key):
+        self.entries.pop(key, None)
+
+
+class RedisLedger(DispatchLedger):
+    """Redis-backed ledger shared by all ai-logic replicas."""
+
+    def __init__(self, url: str, pending_ttl: int, ttl: int, prefix: str = "ai-logic:dispatched:"):
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.pending_ttl = pending_ttl
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def _claim(self, key):
+        return bool(
+            await self.redis.set(self.prefix + key, "pending", nx=True, ex=self.pending_ttl)
+        )
+
+    async def _complete(self, key, resource_id):
+        await self.redis.set(
+            self.prefix + key, json.dumps({"id": resource_id}), ex=self.ttl
+        )
+
+    async def _release(self, key):
+        await self.redis.delete(self.prefix + key)
+
+
+def create_dispatch_ledger() -> Optional[DispatchLedger]:
+    """Build the ledger selected by settings.dispatch_ledger, or None when off."""
+    kind = settings.dispatch_ledger
+    if kind == "memory":
+        return MemoryLedger(settings.dispatch_pending_ttl, settings.dispatch_ledger_ttl)
+    if kind == "redis":
+        return RedisLedger(
+            settings.dispatch_ledger_url,
+            settings.dispatch_pending_ttl,
+            settings.dispatch_ledger_ttl,
+        )
+    if kind != "none":
+        print(f"Unknown dispatch_ledger {kind!r}, idempotent dispatch disabled")
+    return None
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from config import settings
+
+# Bump whenever the extraction prompt changes in a way that changes results
+PROMPT_VERSION = "1"
+
+
+def cache_key(model: str, system_prompt: str, context: str, transcript: str) -> str:
+    """Hash of everything that determines the tool calls for a transcript.
+
+    Whitespace in the transcript is normalized, so re-uploads that differ only
+    in line breaks or spacing share an entry.
+    """
+    normalized = " ".join(transcript.split())
+    material = json.dumps([PROMPT_VERSION, model, system_prompt, context, normalized])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Tool calls extracted per transcript, evicted by total size and age."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        tool_calls = self._get(key)
+        if tool_calls is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tool_calls
+
+    def set(self, key: str, tool_calls: List[Dict[str, Any]]) -> None:
+        self._set(key, json.dumps(tool_calls))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, data):
+        raise NotImplementedError
+
+
+class LocalLLMCache(LLMCache):
+    """Directory-backed cache, one JSON file per transcript.
+
+    Entries expire `ttl_seconds` after they were written. A hit refreshes the
+    file's modification time, so past `max_bytes` the least recently used
+    entries are evicted first.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: int):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry["written"] + self.ttl_seconds < time.time():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        os.utime(path)
+        return entry["tool_calls"]
+
+    def _set(self, key, data):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(f'{{"written": {time.time()}, "tool_calls": {data}}}')
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # An entry is written no later than it was last used, so one unused
+        # for a whole TTL has expired
+        expired_before = time.time() - self.ttl_seconds
+        total = sum(size for _, size, _ in entries)
+        for used, size, path in sorted(entries):
+            if used >= expired_before and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class RedisLLMCache(LLMCache):
+    """Redis-backed cache shared by all ai-logic replicas.
+
+    Entries expire after the TTL on their own. Write times and access times
+    live in two sorted sets and sizes in a hash, so expired entries can be
+    taken out of the running total, and the least recently used ones
+    dropped once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, url: str, max_bytes: int, ttl_seconds: int, prefix: str = "ai-logic:llm:"):
+        super().__init__()
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+        self.written_key = f"{prefix}written"
+        self.sizes_key = f"{prefix}sizes"
+        self.total_key = f"{prefix}total"
+
+    def _get(self, key):
+        data = self.redis.get(self.prefix + key)
+        if data is None:
+            return None
+        self.redis.zadd(self.index_key, {key: time.time()}, xx=True)
+        return json.loads(data)
+
+    def _set(self, key, data):
+        size = len(data.encode("utf-8"))
+        previous = self.redis.hget(self.sizes_key, key)
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.set(self.prefix + key, data, ex=self.ttl_seconds)
+        pipe.zadd(self.index_key, {key: now})
+        pipe.zadd(self.written_key, {key: now})
+        pipe.hset(self.sizes_key, key, size)
+        pipe.incrby(self.total_key, size - int(previous or 0))
+        pipe.execute()
+        self._evict()
+
+    def _evict(self):
+        # Everything written more than a TTL ago has expired already
+        expired = self.redis.zrangebyscore(
+            self.written_key, "-inf", time.time() - self.ttl_seconds
+        )
+        if expired:
+            self._forget(expired)
+        while int(self.redis.get(self.total_key) or 0) > self.max_bytes:
+            oldest = self.redis.zrange(self.index_key, 0, 0)
+            if not oldest:
+                break
+            self._forget(oldest)
+
+    def _forget(self, keys):
+        # Each size is read and removed in one transaction, so when replicas
+        # evict the same key only the one whose hdel succeeds subtracts it
+        pipe = self.redis.pipeline()
+        for key in keys:
+            pipe.hget(self.sizes_key, key)
+            pipe.hdel(self.sizes_key, key)
+        results = pipe.execute()
+        freed = sum(
+            int(size or 0) for size, removed in zip(results[::2], results[1::2]) if removed
+        )
+        pipe = self.redis.pipeline()
+        pipe.delete(*(self.prefix + key for key in keys))
+        pipe.zrem(self.index_key, *keys)
+        pipe.zrem(self.written_key, *keys)
+        pipe.decrby(self.total_key, freed)
+        pipe.execute()
+
+
+def create_llm_cache() -> Optional[LLMCache]:
+    """Build the cache selected by settings.llm_cache, or None when it is off."""
+    kind = settings.llm_cache
+    if kind == "local":
+        return LocalLLMCache(
+            settings.llm_cache_dir, settings.llm_cache_max_bytes, settings.llm_cache_ttl
+        )
+    if kind == "redis":
+        return RedisLLMCache(
+            settings.llm_cache_url, settings.llm_cache_max_bytes, settings.llm_cache_ttl
+        )
+    if kind != "none":
+        print(f"Unknown llm_cache {kind!r}, LLM result cache disabled")
+    return None
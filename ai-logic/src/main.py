@@ -1,9 +1,17 @@
+import time
+
+# Measured from here; the heavy dependencies are loaded later, by warm-up
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
+import asyncio
+import json
 
 from config import settings
-from agent import Agent
 from daily import daily  # Keep this for testing if needed
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
@@ -13,6 +21,10 @@ import secrets
 from auth import (
     get_credentials,
 )
+from clients import close_http_client
+from storage_writer import storage_writer
+from tracing import correlation_id, correlation_middleware, span
+from warmup import Warmup
 
 # Create FastAPI app
 app = FastAPI(
@@ -32,9 +44,24 @@ app.add_middleware(
 # Add session middleware to handle OAuth state
 app.add_middleware(SessionMiddleware, secret_key=secrets.token_urlsafe(32))
 
-# Initialize agent once to be reused across requests
-# agent = Agent("qwen3:14b")
-agent = Agent("llama3.1")
+# Tag every request with the X-Correlation-ID of the recording it belongs to
+app.middleware("http")(correlation_middleware)
+
+# Builds the agent, reused across requests, in the background on startup
+warmup = Warmup()
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+
+@app.on_event("startup")
+async def startup():
+    warmup.start(IMPORT_SECONDS)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Buffered events/tasks are written before the HTTP client goes away
+    await storage_writer.close()
+    await close_http_client()
 
 
 # Define request model
@@ -42,6 +69,10 @@ class TranscriptRequest(BaseModel):
     transcript: str
     options: Optional[Dict[str, Any]] = None
     user_id: str
+    # Identifies the recording, so retries of it do not create items twice
+    job_id: Optional[str] = None
+    # Batch items carry their own correlation id instead of the header
+    correlation_id: Optional[str] = None
 
 
 # Define response model
@@ -50,12 +81,30 @@ class ProcessResponse(BaseModel):
     tool_calls: Optional[List[Dict[str, Any]]] = None
 
 
+class BatchRequest(BaseModel):
+    items: List[TranscriptRequest]
+
+
+class BatchItemResult(BaseModel):
+    status: str  # "ok" or "error"
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+
+
 @app.post("/process")
 async def process_transcript(request: TranscriptRequest) -> str:
     try:
-        print("Recived message for user: ", request.user_id)
-        credentials = get_credentials(request.user_id)
-        response = agent.trigger(request.transcript, credentials, request.user_id)
+        print(f"[{correlation_id.get()}] Recived message for user: ", request.user_id)
+        with span("credentials"):
+            credentials = await get_credentials(request.user_id)
+        agent = await warmup.get_agent()
+        response = await agent.trigger(
+            request.transcript, credentials, request.user_id, request.job_id
+        )
         print("Response from agent:", response)
         return response
     except HTTPException as e:
@@ -68,11 +117,116 @@ async def process_transcript(request: TranscriptRequest) -> str:
         )
 
 
-# For local testing
+@app.post("/process/stream")
+async def process_transcript_stream(request: TranscriptRequest) -> StreamingResponse:
+    """Like /process, but reports every action item as a server-sent event
+    as soon as it is created, ending with a "done" event."""
+    print(f"[{correlation_id.get()}] Recived streaming request for user: ", request.user_id)
+    with span("credentials"):
+        credentials = await get_credentials(request.user_id)
+    agent = await warmup.get_agent()
+
+    async def events():
+        async for event in agent.stream(
+            request.transcript, credentials, request.user_id, request.job_id
+        ):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/process/batch")
+async def process_batch(request: BatchRequest) -> BatchResponse:
+    """Process many transcripts, returning one result per item in order.
+
+    Credentials are fetched once per distinct user, and up to
+    `settings.batch_concurrency` transcripts are analyzed at the same time.
+    A failing item does not fail the others.
+    """
+    print(f"Received batch of {len(request.items)} transcripts")
+    user_ids = list({item.user_id for item in request.items})
+    with span("credentials"):
+        fetched = await asyncio.gather(
+            *(get_credentials(user_id) for user_id in user_ids),
+            return_exceptions=True,
+        )
+    credentials = dict(zip(user_ids, fetched))
+    agent = await warmup.get_agent()
+    semaphore = asyncio.Semaphore(settings.batch_concurrency)
+
+    async def process_item(item: TranscriptRequest) -> BatchItemResult:
+        # Each item runs in its own task, so this does not leak between items
+        if item.correlation_id:
+            correlation_id.set(item.correlation_id)
+        user_credentials = credentials[item.user_id]
+        if isinstance(user_credentials, Exception):
+            return BatchItemResult(
+                status="error", error=f"Error fetching credentials: {user_credentials}"
+            )
+        if user_credentials is None:
+            return BatchItemResult(status="error", error="No credentials for user")
+
+        async with semaphore:
+            try:
+                result = await agent.trigger(
+                    item.transcript, user_credentials, item.user_id, item.job_id
+                )
+                return BatchItemResult(status="ok", result=result)
+            except Exception as e:
+                print(f"Error processing transcript: {str(e)}")
+                return BatchItemResult(
+                    status="error", error=f"Error processing transcript: {str(e)}"
+                )
+
+    results = await asyncio.gather(*(process_item(item) for item in request.items))
+    return BatchResponse(results=results)
+
+
+# For local testing: extracts the sample daily's action items without
+# creating them, so no user or credentials are needed. Repeated calls are
+# answered from the LLM cache.
 @app.get("/test")
 async def test_with_sample():
-    response = agent.trigger(daily)
-    return response
+    agent = await warmup.get_agent()
+    return {"tool_calls": await agent.extract(daily)}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    agent = await warmup.get_agent()
+    if agent.cache is None:
+        return {"llm_cache": None}
+    return {"llm_cache": agent.cache.stats()}
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    agent = await warmup.get_agent()
+    return {**agent.router.stats.snapshot(), "compaction": agent.compaction_stats}
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up; fails only if warm-up failed and a restart is needed."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=503 if status["status"] == "failed" else 200)
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Ready once warm-up finished, with how long importing and warming up took."""
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["status"] == "ready" else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/authorize")
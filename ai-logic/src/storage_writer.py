@@ -0,0 +1,117 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from prometheus_client import Gauge
+
+from clients import get_http_client
+from config import settings
+from tracing import correlation_id, span
+
+BUFFERED = Gauge(
+    "ai_logic_storage_buffered_items", "Events and tasks waiting to be stored", ["collection"]
+)
+
+# An item and the correlation id of the request that created it
+Entry = Tuple[Optional[str], Dict[str, Any]]
+
+
+class StorageWriter:
+    """Write-behind buffer for events and tasks created in Google.
+
+    Items are queued per collection and sent to the storage service's bulk
+    endpoints once `settings.storage_batch_size` are waiting, or
+    `settings.storage_flush_interval` seconds after the first one arrived, so
+    storage latency stays out of `/process`. Failed flushes are retried with
+    backoff; items that still fail go back in the buffer for the next flush.
+    """
+
+    def __init__(self):
+        self.buffers: Dict[str, List[Entry]] = {"events": [], "tasks": []}
+        self.timers: Dict[str, asyncio.TimerHandle] = {}
+        # Keeps flush tasks referenced until they finish
+        self.flushes = set()
+        for collection in self.buffers:
+            BUFFERED.labels(collection).set_function(
+                lambda collection=collection: len(self.buffers[collection])
+            )
+
+    def add(self, collection: str, item: Dict[str, Any]) -> None:
+        buffer = self.buffers[collection]
+        buffer.append((correlation_id.get(), item))
+        if len(buffer) >= settings.storage_batch_size:
+            self._flush_soon(collection)
+        elif collection not in self.timers:
+            self.timers[collection] = asyncio.get_running_loop().call_later(
+                settings.storage_flush_interval, self._flush_soon, collection
+            )
+
+    def _flush_soon(self, collection: str) -> None:
+        timer = self.timers.pop(collection, None)
+        if timer:
+            timer.cancel()
+        items = self.buffers[collection]
+        if not items:
+            return
+        self.buffers[collection] = []
+        task = asyncio.create_task(self._flush(collection, items))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def _flush(self, collection: str, items: List[Entry]) -> None:
+        for start in range(0, len(items), settings.storage_batch_size):
+            batch = items[start : start + settings.storage_batch_size]
+            if not await self._post(collection, batch):
+                self._requeue(collection, items[start:])
+                return
+            print(f"Stored {len(batch)} {collection}")
+
+    async def _post(self, collection: str, batch: List[Entry]) -> bool:
+        url = f"{settings.storage_url}/{collection}/bulk"
+        # A batch mixes items of several requests, so it is tagged with all
+        # of their ids; flushes run in their own task, so this stays local
+        correlation_id.set(",".join(sorted({cid for cid, _ in batch if cid})) or None)
+        items = [item for _, item in batch]
+        for attempt in range(settings.storage_max_retries + 1):
+            try:
+                with span("storage"):
+                    response = await get_http_client().post(url, json=items)
+                if response.is_success:
+                    rejected = response.json().get("rejected") or []
+                    if rejected:
+                        print(f"Storage rejected {len(rejected)} {collection}: {rejected}")
+                    return True
+                error = f"{response.status_code} - {response.text}"
+                if response.status_code < 500:
+                    # The storage service rejected the items; retrying won't help
+                    print(f"Dropping {len(batch)} {collection}: {error}")
+                    return True
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < settings.storage_max_retries:
+                delay = settings.storage_retry_backoff * 2**attempt * (1 + random.random())
+                await asyncio.sleep(delay)
+        print(f"Failed to store {len(batch)} {collection}: {error}")
+        return False
+
+    def _requeue(self, collection: str, items: List[Entry]) -> None:
+        buffer = self.buffers[collection]
+        buffer[:0] = items
+        overflow = len(buffer) - settings.storage_buffer_limit
+        if overflow > 0:
+            print(f"Storage buffer full, dropping {overflow} oldest {collection}")
+            del buffer[:overflow]
+        if collection not in self.timers:
+            self.timers[collection] = asyncio.get_running_loop().call_later(
+                settings.storage_flush_interval, self._flush_soon, collection
+            )
+
+    async def close(self) -> None:
+        """Flush everything still buffered; called on shutdown."""
+        for collection in self.buffers:
+            self._flush_soon(collection)
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
+
+
+storage_writer = StorageWriter()
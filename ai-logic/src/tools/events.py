@@ -1,13 +1,11 @@
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List
 from langchain_core.tools import tool
-import requests
 
-# Import authentication functions
-from auth import get_credentials
+from storage_writer import storage_writer
+from tools.google_services import execute, execute_batch, get_service
 
 
 class EventTime(BaseModel):
@@ -53,7 +51,7 @@ class Event(BaseModel):
     args_schema=Event.model_json_schema(),
     parse_docstring=True,
 )
-def schedule_meeting(
+async def schedule_meeting(
     credentials: Credentials,
     user_id: str,
     summary: str,
@@ -87,41 +85,18 @@ def schedule_meeting(
     Returns:
         Dict[str, Any]: The created event details.
     """
-    # Convert string datetime to dict format if needed
-    if isinstance(start, str):
-        start = {"dateTime": start, "timeZone": "UTC"}
-    if isinstance(end, str):
-        end = {"dateTime": end, "timeZone": "UTC"}
-    
     try:
-        service = build("calendar", "v3", credentials=credentials)
-
-        # Convert Pydantic model to dictionary
-        event_dict = Event.model_validate(
-            Event(
-                summary=summary,
-                location=location,
-                description=description,
-                start=start,
-                end=end,
-                reminders=reminders,
-            )
-        ).model_dump()
+        event_dict = event_body(summary, location, description, start, end, reminders)
+        service = get_service("calendar", "v3", credentials)
 
         # Insert the event into the calendar
         calendar_id = "primary"  # Uses the authenticated user's primary calendar
-        created_event = (
-            service.events().insert(calendarId=calendar_id, body=event_dict).execute()
+        created_event = await execute(
+            service.events().insert(calendarId=calendar_id, body=event_dict),
+            credentials,
         )
 
-        requests.post(
-            "http://storage:3000/events",
-            headers={
-                "accept": "application/json, text/plain, */*",
-            },
-            json={**created_event, "userId": user_id},
-            verify=False,
-        )
+        store_event(created_event, user_id)
         print(f"Event created: {created_event}")
 
         return created_event
@@ -129,3 +104,44 @@ def schedule_meeting(
     except HttpError as error:
         print(f"An error occurred: {error}")
         raise
+
+
+def event_body(
+    summary: str,
+    location: str,
+    description: str,
+    start: Dict[str, str],
+    end: Dict[str, str],
+    reminders: Dict[str, bool] = {"useDefault": True},
+) -> Dict[str, Any]:
+    """Validate tool call arguments into a Calendar event resource."""
+    # Convert string datetime to dict format if needed
+    if isinstance(start, str):
+        start = {"dateTime": start, "timeZone": "UTC"}
+    if isinstance(end, str):
+        end = {"dateTime": end, "timeZone": "UTC"}
+
+    return Event(
+        summary=summary,
+        location=location,
+        description=description,
+        start=start,
+        end=end,
+        reminders=reminders,
+    ).model_dump()
+
+
+def store_event(created_event: Dict[str, Any], user_id: str) -> None:
+    """Queue the event for the next bulk write to the storage service."""
+    storage_writer.add("events", {**created_event, "userId": user_id})
+
+
+async def insert_events(
+    credentials: Credentials, bodies: List[Dict[str, Any]]
+) -> List[Any]:
+    """Create many events with batch HTTP requests; see `execute_batch`."""
+    service = get_service("calendar", "v3", credentials)
+    requests = [
+        service.events().insert(calendarId="primary", body=body) for body in bodies
+    ]
+    return await execute_batch(service, requests, credentials)
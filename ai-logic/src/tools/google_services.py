@@ -0,0 +1,120 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+
+from config import settings
+from tracing import span
+
+# Google rejects batch requests with more than 50 calls for Calendar and Tasks
+BATCH_LIMIT = 50
+
+# The APIs the tools call, loaded by warm_up()
+APIS = [("calendar", "v3"), ("tasks", "v1")]
+
+_services = OrderedDict()
+_services_lock = threading.Lock()
+# (api, version) -> parsed discovery document
+_documents: Dict[tuple, dict] = {}
+
+
+def discovery_document(api: str, version: str) -> dict:
+    """The discovery document bundled with google-api-python-client, parsed once."""
+    document = _documents.get((api, version))
+    if document is None:
+        from googleapiclient import discovery_cache
+
+        document = json.loads(discovery_cache.get_static_doc(api, version))
+        _documents[(api, version)] = document
+    return document
+
+
+def warm_up() -> None:
+    """Import the client library and parse the discovery documents of APIS.
+
+    Building a client once also applies the library's one-time fix-ups to
+    the shared document, so later builds only create the resource objects.
+    """
+    from googleapiclient.discovery import build_from_document
+
+    for api, version in APIS:
+        # An explicit transport keeps the build from looking for credentials
+        build_from_document(discovery_document(api, version), http=httplib2.Http())
+
+
+def get_service(api: str, version: str, credentials: Credentials):
+    """Return a cached API client for `credentials`, building it on first use.
+
+    Clients are built from the discovery documents bundled with
+    google-api-python-client, parsed once per process, so building one does
+    no network or file I/O, and the least recently used clients are dropped
+    beyond `settings.google_service_cache_size`.
+    """
+    key = (api, version, credentials.token)
+    with _services_lock:
+        service = _services.get(key)
+        if service is not None:
+            _services.move_to_end(key)
+            return service
+
+    from googleapiclient.discovery import build_from_document
+
+    service = build_from_document(discovery_document(api, version), credentials=credentials)
+    with _services_lock:
+        _services[key] = service
+        while len(_services) > settings.google_service_cache_size:
+            _services.popitem(last=False)
+    return service
+
+
+def authorized_http(credentials: Credentials) -> AuthorizedHttp:
+    # httplib2 connections are not thread-safe, so a cached client is shared
+    # but every execute gets its own transport
+    return AuthorizedHttp(credentials, http=httplib2.Http())
+
+
+async def execute(request, credentials: Credentials) -> Any:
+    """Run a single API request in a worker thread."""
+    with span("google"):
+        return await asyncio.to_thread(request.execute, http=authorized_http(credentials))
+
+
+def _execute_batch(service, requests, credentials):
+    results: List[Any] = [None] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = exception if exception is not None else response
+
+    http = authorized_http(credentials)
+    for start in range(0, len(requests), BATCH_LIMIT):
+        end = min(start + BATCH_LIMIT, len(requests))
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(start, end):
+            batch.add(requests[index], request_id=str(index))
+        try:
+            batch.execute(http=http)
+        except Exception as e:
+            # Only this batch failed; calls answered before the error and
+            # the other batches keep their results
+            print(f"Batch of {end - start} Google calls failed: {e}")
+            for index in range(start, end):
+                if results[index] is None:
+                    results[index] = e
+    return results
+
+
+async def execute_batch(service, requests, credentials: Credentials) -> List[Any]:
+    """Send `requests` as Google batch HTTP requests, BATCH_LIMIT calls each.
+
+    Returns one entry per request, in order: the response, or the exception
+    raised for that call. A failing call does not fail the others.
+    """
+    if not requests:
+        return []
+    with span("google_batch"):
+        return await asyncio.to_thread(_execute_batch, service, requests, credentials)
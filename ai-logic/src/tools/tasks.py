@@ -1,13 +1,11 @@
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List
 from langchain_core.tools import tool
-import requests
 
-# Import authentication functions
-from auth import get_credentials
+from storage_writer import storage_writer
+from tools.google_services import execute, execute_batch, get_service
 
 
 class Task(BaseModel):
@@ -28,7 +26,7 @@ class Task(BaseModel):
     args_schema=Task.model_json_schema(),
     parse_docstring=True,
 )
-def add_todo(
+async def add_todo(
     title: str, notes: str, due: str, credentials: Credentials, user_id: str
 ) -> Dict[str, Any]:
     """
@@ -39,46 +37,18 @@ def add_todo(
         notes (str): The notes or description of the task.
         due (str): The due date and time of the task in ISO 8601 format (e.g., "2025-03-31T10:00:00Z").
     """
-    # Get user credentials through OAuth
-    # TODO - remove this after fix llm hilosinations
-    if isinstance(due, dict):
-        if "dateTime" in due:
-            due = due["dateTime"]
-        elif "date" in due:
-            due = due["date"] + "T00:00:00Z"
-
     try:
-        service = build(
-            "tasks",
-            "v1",
-            credentials=credentials,
-        )
-
-        print("Service created successfully.")
-        task_dict = Task(
-            title=title,
-            notes=notes,
-            due=due,
-        ).model_dump()
-
+        task_dict = task_body(title, notes, due)
+        service = get_service("tasks", "v1", credentials)
         print(task_dict)
 
         tasklist_id = "@default"  # Uses the authenticated user's default task list
-        created_task = (
-            service.tasks().insert(tasklist=tasklist_id, body=task_dict).execute()
+        created_task = await execute(
+            service.tasks().insert(tasklist=tasklist_id, body=task_dict), credentials
         )
         print("Task created successfully.")
 
-        response = requests.post(
-            "http://storage:3000/tasks",
-            headers={
-                "accept": "application/json, text/plain, */*",
-            },
-            json={**created_task, "userId": user_id},
-            verify=False,
-        )
-
-        print(f"Response from storage service: {response.status_code} - {response.text}")
+        store_task(created_task, user_id)
 
         print(f"Task created: {created_task}")
         return created_task
@@ -86,3 +56,31 @@ def add_todo(
     except HttpError as error:
         print(f"An error occurred: {error}")
         raise
+
+
+def task_body(title: str, notes: str, due: str) -> Dict[str, Any]:
+    """Validate tool call arguments into a Tasks task resource."""
+    # TODO - remove this after fix llm hilosinations
+    if isinstance(due, dict):
+        if "dateTime" in due:
+            due = due["dateTime"]
+        elif "date" in due:
+            due = due["date"] + "T00:00:00Z"
+
+    return Task(title=title, notes=notes, due=due).model_dump()
+
+
+def store_task(created_task: Dict[str, Any], user_id: str) -> None:
+    """Queue the task for the next bulk write to the storage service."""
+    storage_writer.add("tasks", {**created_task, "userId": user_id})
+
+
+async def insert_tasks(
+    credentials: Credentials, bodies: List[Dict[str, Any]]
+) -> List[Any]:
+    """Create many tasks with batch HTTP requests; see `execute_batch`."""
+    service = get_service("tasks", "v1", credentials)
+    requests = [
+        service.tasks().insert(tasklist="@default", body=body) for body in bodies
+    ]
+    return await execute_batch(service, requests, credentials)
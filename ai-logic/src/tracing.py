@@ -0,0 +1,57 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import Histogram
+
+CORRELATION_HEADER = "X-Correlation-ID"
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "ai_logic_stage_seconds",
+    "Time spent in each stage of processing a transcript",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "ai_logic_request_seconds",
+    "Time to respond to an HTTP request, by route and status",
+    ["path", "status"],
+    buckets=STAGE_BUCKETS,
+)
+
+# Id of the recording being processed, stamped where it was enqueued and
+# carried through STT and ai-producer; every log line and outgoing call of
+# the request includes it
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+
+def new_correlation_id() -> str:
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage` of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        print(f"[{correlation_id.get()}] {stage} took {elapsed:.3f}s")
+
+
+async def correlation_middleware(request, call_next):
+    """Adopt the caller's correlation id, or start one, for the request."""
+    correlation_id.set(request.headers.get(CORRELATION_HEADER) or new_correlation_id())
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route else "unmatched"
+    REQUEST_SECONDS.labels(path, response.status_code).observe(time.perf_counter() - start)
+    response.headers[CORRELATION_HEADER] = correlation_id.get()
+    return response
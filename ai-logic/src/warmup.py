@@ -0,0 +1,109 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Dict, Optional
+
+from auth import AUTH_SERVICE_URL
+from clients import get_http_client
+from config import settings
+
+
+class Warmup:
+    """Builds the agent and warms its dependencies after the server is up.
+
+    The service starts answering health checks right away; requests that
+    need the agent wait until warm-up has built it. Each step is timed and
+    reported by the readiness endpoint.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.import_seconds: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.agent = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self, import_seconds: float) -> None:
+        self.import_seconds = import_seconds
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        start = time.perf_counter()
+        try:
+            # Imports LangChain and the model client, and converts the tool
+            # schemas once for every tier
+            self.agent = await self.step("agent", asyncio.to_thread(_build_agent))
+            await self.step("google_discovery", asyncio.to_thread(_warm_google))
+            await self.step("connections", self.open_connections())
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Warm-up failed: {self.error}")
+            return
+        self.steps["total"] = time.perf_counter() - start
+        print(f"Warm-up finished in {self.steps['total']:.2f}s: {self.steps}")
+
+    async def step(self, name: str, work) -> Any:
+        start = time.perf_counter()
+        result = await work
+        self.steps[name] = time.perf_counter() - start
+        return result
+
+    async def open_connections(self) -> None:
+        """Open keep-alive connections to the services every request uses.
+
+        Failures are only logged: a dependency that is still starting should
+        not keep this service from becoming ready.
+        """
+        client = get_http_client()
+        pools = [client.get(settings.storage_url), client.get(AUTH_SERVICE_URL)]
+        for store in (self.agent.cache, self.agent.ledger):
+            redis = getattr(store, "redis", None)
+            if redis is not None:
+                # The LLM cache uses the blocking client, the ledger the async one
+                ping = redis.ping
+                if inspect.iscoroutinefunction(ping):
+                    pools.append(ping())
+                else:
+                    pools.append(asyncio.to_thread(ping))
+        for result in await asyncio.gather(*pools, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"Warm-up could not connect: {type(result).__name__}: {result}")
+
+    @property
+    def ready(self) -> bool:
+        return self.task is not None and self.task.done() and self.error is None
+
+    async def get_agent(self):
+        """The agent, once warm-up has built it; raises if warm-up failed."""
+        await asyncio.shield(self.task)
+        if self.error:
+            raise RuntimeError(f"ai-logic failed to start: {self.error}")
+        return self.agent
+
+    def status(self) -> Dict[str, Any]:
+        if self.ready:
+            state = "ready"
+        elif self.error:
+            state = "failed"
+        else:
+            state = "warming"
+        return {
+            "status": state,
+            "uptime_seconds": round(time.monotonic() - self.started, 3),
+            "import_seconds": round(self.import_seconds or 0.0, 3),
+            "warmup_seconds": {name: round(value, 3) for name, value in self.steps.items()},
+            "error": self.error,
+        }
+
+
+def _build_agent():
+    from agent import Agent
+
+    return Agent(settings.local_model)
+
+
+def _warm_google():
+    from tools import google_services
+
+    google_services.warm_up()
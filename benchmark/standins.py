@@ -0,0 +1,362 @@
+"""Local stand-ins for the services the pipeline talks to.
+
+Each service runs its real code in its own process. Only the edges are
+replaced: RabbitMQ with queues served by the harness process, GCS with a
+directory, and the auth, storage and Google APIs with canned responses. The
+LLM is ai-logic's own fake backend.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import queue
+import re
+import time
+import uuid
+from email.parser import Parser
+from types import SimpleNamespace
+
+import httplib2
+import httpx
+
+# How often idle consumers poll the broker, in seconds
+POLL_INTERVAL = 0.005
+BLANK_LINE = re.compile(r"\r?\n\r?\n")
+
+
+def message(body, correlation_id=None, redelivered=False):
+    """A broker message as it is stored in the harness queues."""
+    return {"body": body, "correlation_id": correlation_id, "redelivered": redelivered}
+
+
+# --- RabbitMQ, as seen by pika (STT) ------------------------------------
+
+
+class BlockingConnection:
+    """pika.BlockingConnection over the harness queues.
+
+    Supports what co-pilot-stt.py uses: one channel, one consumer with a
+    prefetch limit, acks and nacks, publishing, and callbacks scheduled from
+    other threads.
+    """
+
+    def __init__(self, queues, params=None):
+        self.queues = queues
+        self.callbacks = queue.Queue()
+        self.is_open = True
+        self._channel = None
+
+    def channel(self):
+        self._channel = BlockingChannel(self)
+        return self._channel
+
+    def add_callback_threadsafe(self, callback):
+        if not self.is_open:
+            import pika
+
+            raise pika.exceptions.ConnectionWrongStateError("Connection is closed")
+        self.callbacks.put(callback)
+
+    def process_data_events(self, time_limit=0):
+        deadline = time.monotonic() + time_limit
+        while True:
+            busy = self._run_callbacks()
+            if self._channel is not None:
+                busy = self._channel.deliver() or busy
+            if time.monotonic() >= deadline:
+                return
+            if not busy:
+                try:
+                    self.callbacks.get(timeout=POLL_INTERVAL)()
+                except queue.Empty:
+                    pass
+
+    def _run_callbacks(self):
+        ran = False
+        while True:
+            try:
+                callback = self.callbacks.get_nowait()
+            except queue.Empty:
+                return ran
+            callback()
+            ran = True
+
+    def close(self):
+        self.is_open = False
+
+
+class BlockingChannel:
+    def __init__(self, connection):
+        self.connection = connection
+        self.prefetch_count = 0
+        self.consumer = None
+        self.unacked = {}
+        self.next_tag = 1
+
+    def queue_declare(self, queue):
+        pass
+
+    def basic_qos(self, prefetch_count=0):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, queue, on_message_callback):
+        self.consumer = (queue, on_message_callback)
+        return "bench-consumer"
+
+    def basic_cancel(self, consumer_tag):
+        self.consumer = None
+
+    def deliver(self):
+        """Hand queued messages to the consumer, up to the prefetch limit."""
+        import pika
+
+        delivered = False
+        while self.consumer and (
+            not self.prefetch_count or len(self.unacked) < self.prefetch_count
+        ):
+            name, callback = self.consumer
+            try:
+                item = self.connection.queues[name].get_nowait()
+            except queue.Empty:
+                break
+            tag = self.next_tag
+            self.next_tag += 1
+            self.unacked[tag] = (name, item)
+            method = SimpleNamespace(delivery_tag=tag, redelivered=item["redelivered"])
+            properties = pika.BasicProperties(correlation_id=item["correlation_id"])
+            callback(self, method, properties, item["body"])
+            delivered = True
+        return delivered
+
+    def basic_ack(self, delivery_tag):
+        self.unacked.pop(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=True):
+        name, item = self.unacked.pop(delivery_tag)
+        if requeue:
+            self.connection.queues[name].put({**item, "redelivered": True})
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        correlation_id = properties.correlation_id if properties else None
+        self.connection.queues[routing_key].put(message(body, correlation_id))
+
+
+# --- RabbitMQ, as seen by aio-pika (ai-producer) -------------------------
+
+
+class AioPika:
+    """Stands in for the aio_pika module inside co-pilot-transcription.py.
+
+    Every acked or nacked message is also reported on `settled`, which is
+    how the harness knows a job went all the way through.
+    """
+
+    def __init__(self, queues, settled):
+        self.queues = queues
+        self.settled = settled
+
+    async def connect_robust(self, url):
+        return AioConnection(self)
+
+
+class AioConnection:
+    def __init__(self, broker):
+        self.broker = broker
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def channel(self):
+        return AioChannel(self.broker)
+
+
+class AioChannel:
+    def __init__(self, broker):
+        self.broker = broker
+        self.prefetch_count = 0
+
+    async def set_qos(self, prefetch_count=0):
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name):
+        return AioQueue(self.broker, name, self.prefetch_count)
+
+
+class AioQueue:
+    def __init__(self, broker, name, prefetch_count):
+        self.broker = broker
+        self.name = name
+        self.slots = asyncio.Semaphore(prefetch_count or 1_000_000)
+        self.poller = None
+        # Keeps callback tasks referenced until they finish
+        self.callbacks = set()
+
+    async def consume(self, callback):
+        self.poller = asyncio.create_task(self._poll(callback))
+        return "bench-consumer"
+
+    async def cancel(self, consumer_tag):
+        self.poller.cancel()
+
+    async def _poll(self, callback):
+        source = self.broker.queues[self.name]
+        while True:
+            await self.slots.acquire()
+            while True:
+                try:
+                    item = source.get_nowait()
+                    break
+                except queue.Empty:
+                    await asyncio.sleep(POLL_INTERVAL)
+            task = asyncio.create_task(callback(AioMessage(self, item)))
+            self.callbacks.add(task)
+            task.add_done_callback(self.callbacks.discard)
+
+
+class AioMessage:
+    def __init__(self, queue_, item):
+        self.queue = queue_
+        self.item = item
+        self.body = item["body"].encode() if isinstance(item["body"], str) else item["body"]
+        self.redelivered = item["redelivered"]
+        self.correlation_id = item["correlation_id"]
+
+    def _settle(self, outcome):
+        self.queue.slots.release()
+        self.queue.broker.settled.put(
+            {"body": self.item["body"], "outcome": outcome, "at": time.time()}
+        )
+
+    async def ack(self):
+        self._settle("ok")
+
+    async def nack(self, requeue=True):
+        if requeue:
+            self.queue.slots.release()
+            self.queue.broker.queues[self.queue.name].put({**self.item, "redelivered": True})
+        else:
+            self._settle("dropped")
+
+
+# --- GCS -----------------------------------------------------------------
+
+
+class FakeStorageClient:
+    """google.cloud.storage.Client over a directory: bucket/blob -> root/bucket/blob."""
+
+    def __init__(self, root):
+        self.root = root
+        self.hashes = {}
+
+    def bucket(self, name):
+        return FakeBucket(self, name)
+
+
+class FakeBucket:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def get_blob(self, name):
+        path = os.path.join(self.client.root, self.name, name)
+        if not os.path.exists(path):
+            return None
+        return FakeBlob(self.client, path)
+
+
+class FakeBlob:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.size = os.path.getsize(path)
+        self.crc32c = None
+
+    @property
+    def md5_hash(self):
+        real = os.path.realpath(self.path)
+        if real not in self.client.hashes:
+            with open(real, "rb") as f:
+                digest = hashlib.md5(f.read()).digest()
+            self.client.hashes[real] = base64.b64encode(digest).decode()
+        return self.client.hashes[real]
+
+    def open(self, mode="rb", chunk_size=None):
+        return open(self.path, mode)
+
+
+# --- Google Calendar and Tasks ------------------------------------------
+
+
+def _created(body):
+    resource = json.loads(body) if body else {}
+    resource["id"] = uuid.uuid4().hex
+    resource["htmlLink"] = f"https://example.invalid/{resource['id']}"
+    return resource
+
+
+class FakeGoogleHttp:
+    """httplib2.Http that answers Calendar and Tasks inserts, batched or not.
+
+    Every request, batch or single, costs `latency` seconds, like one round
+    trip to Google.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        content_type = headers.get("content-type", "")
+        if content_type.startswith("multipart/mixed"):
+            return self._batch(body, content_type)
+        resource = _created(body)
+        response = httplib2.Response({"status": 200, "content-type": "application/json"})
+        return response, json.dumps(resource).encode()
+
+    def _batch(self, body, content_type):
+        parsed = Parser().parsestr(f"content-type: {content_type}\r\n\r\n{body}")
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in parsed.get_payload():
+            # Each part is a serialized HTTP request: request line, headers,
+            # blank line, JSON body
+            request_body = BLANK_LINE.split(part.get_payload(), 1)[-1].strip()
+            resource = _created(request_body or None)
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: {part['Content-ID']}\r\n\r\n"
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: application/json\r\n\r\n"
+                f"{json.dumps(resource)}\r\n"
+            )
+        content = "".join(parts) + f"--{boundary}--\r\n"
+        response = httplib2.Response(
+            {"status": 200, "content-type": f"multipart/mixed; boundary={boundary}"}
+        )
+        return response, content.encode()
+
+
+# --- auth and storage services ------------------------------------------
+
+
+def service_transport(storage_latency=0.0):
+    """httpx transport answering the auth and storage services ai-logic calls."""
+
+    async def handle(request):
+        if request.url.host == "auth":
+            return httpx.Response(200, json={"accessToken": "bench-token"})
+        if request.url.path.endswith("/bulk"):
+            if storage_latency:
+                await asyncio.sleep(storage_latency)
+            items = json.loads(request.content)
+            return httpx.Response(200, json={"upserted": len(items)})
+        return httpx.Response(404, json={"error": f"no stand-in for {request.url}"})
+
+    return httpx.MockTransport(handle)
@@ -1,20 +1,36 @@
 import amqp from "amqplib";
+import { randomUUID } from "crypto";
 
 const AMQP_URL = process.env.AMQP_URL;
 const AUDIO_FILES_QUEUE = process.env.AUDIO_FILES_QUEUE || "transcriptions";
 const TRANSCRIPTION_ANALYS_QUEUE =
   process.env.TRANSCRIPTIONS_QUEUE || "transcriptions";
 
-interface STTMessagePayload {
+// Every upload gets a correlation id that STT, ai-producer and ai-logic
+// carry in their logs and metrics; enqueued_at (epoch seconds) lets them
+// report how long the message waited in the queue
+interface TracedPayload {
+  correlation_id: string;
+  enqueued_at: number;
+}
+
+interface STTMessagePayload extends TracedPayload {
   file: string;
   user_id: string;
 }
 
-interface AnalysMessagePayload {
+interface AnalysMessagePayload extends TracedPayload {
   transcription: string;
   user_id: string;
 }
 
+function newTrace(): TracedPayload {
+  return {
+    correlation_id: randomUUID().replace(/-/g, ""),
+    enqueued_at: Date.now() / 1000,
+  };
+}
+
 async function connectRabbitMQ(queue: string): Promise<{
   connection: amqp.ChannelModel;
   channel: amqp.Channel;
@@ -61,12 +77,15 @@ export async function sendTranscriptionForAnalyse(
     const message: AnalysMessagePayload = {
       transcription: transcription,
       user_id: userId,
+      ...newTrace(),
     };
     const messageBuffer = Buffer.from(JSON.stringify(message));
 
-    channel.sendToQueue(TRANSCRIPTION_ANALYS_QUEUE, messageBuffer);
+    channel.sendToQueue(TRANSCRIPTION_ANALYS_QUEUE, messageBuffer, {
+      correlationId: message.correlation_id,
+    });
     console.info(
-      `Sent for transcription analys to queue ${TRANSCRIPTION_ANALYS_QUEUE}`
+      `[${message.correlation_id}] Sent for transcription analys to queue ${TRANSCRIPTION_ANALYS_QUEUE}`
     );
 
     await channel.close();
@@ -101,12 +120,18 @@ export async function sendFileForSTT(
   const { connection, channel } = connectionDetails;
 
   try {
-    const message: STTMessagePayload = { file: filePath, user_id: userId };
+    const message: STTMessagePayload = {
+      file: filePath,
+      user_id: userId,
+      ...newTrace(),
+    };
     const messageBuffer = Buffer.from(JSON.stringify(message));
 
-    channel.sendToQueue(AUDIO_FILES_QUEUE, messageBuffer);
+    channel.sendToQueue(AUDIO_FILES_QUEUE, messageBuffer, {
+      correlationId: message.correlation_id,
+    });
     console.info(
-      `Sent ${filePath} for transcription to queue ${AUDIO_FILES_QUEUE}`
+      `[${message.correlation_id}] Sent ${filePath} for transcription to queue ${AUDIO_FILES_QUEUE}`
     );
 
     await channel.close();
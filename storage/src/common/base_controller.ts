@@ -73,6 +73,70 @@ class BaseController<T> {
     }
   }
 
+  // Items are upserted on their Google resource id, so a bulk write that is
+  // retried after a lost response does not store them twice. Upserts skip
+  // schema validation, so each item is validated first; the valid ones are
+  // stored and the invalid ones are reported back by their index.
+  async createMany(req: Request, res: Response) {
+    const items: T[] = req.body;
+    if (
+      !Array.isArray(items) ||
+      items.some((item) => !(item as { id?: string }).id)
+    ) {
+      res.status(400).send({
+        message: "Bad Request",
+        details: "Body must be an array of items with an id",
+      });
+      return;
+    }
+
+    const results = await Promise.allSettled(
+      items.map((item) => new this.model(item).validate())
+    );
+    const rejected = results.flatMap((result, index) =>
+      result.status === "rejected"
+        ? [{ index, details: (result.reason as Error).message }]
+        : []
+    );
+    const valid = items.filter(
+      (_, index) => results[index].status === "fulfilled"
+    );
+    if (valid.length === 0) {
+      res.status(400).send({ message: "Bad Request", rejected });
+      return;
+    }
+
+    try {
+      const operations = valid.map((item) => ({
+        updateOne: {
+          filter: { id: (item as { id: string }).id },
+          update: { $set: item },
+          upsert: true,
+        },
+      })) as Parameters<Model<T>["bulkWrite"]>[0];
+      const result = await this.model.bulkWrite(operations, { ordered: false });
+      res.status(201).send({
+        upserted: result.upsertedCount,
+        matched: result.matchedCount,
+        rejected,
+      });
+    } catch (error) {
+      const err = error as Error;
+      if (err.name === "ValidationError") {
+        res.status(400).send({ message: "Bad Request", details: err.message });
+      } else if (err.name === "MongoServerSelectionError") {
+        res.status(500).send({
+          message: "Internal Server Error",
+          details: "Database connection error",
+        });
+      } else {
+        res
+          .status(500)
+          .send({ message: "Internal Server Error", details: err.message });
+      }
+    }
+  }
+
   async delete(req: Request, res: Response) {
     const id = req.params.id;
     try {
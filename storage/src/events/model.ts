@@ -34,7 +34,7 @@ export interface Event {
 }
 
 const eventSchema = new Schema<Event>({
-  id: { type: String, required: true },
+  id: { type: String, required: true, index: true, unique: true },
   userId: { type: String, required: true, default: "" },
   status: { type: String, required: true },
   htmlLink: { type: String, required: true },
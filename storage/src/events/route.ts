@@ -169,6 +169,50 @@ router.get(
  */
 router.post("/", eventsController.create.bind(eventsController));
 
+/**
+ * @swagger
+ * /events/bulk:
+ *   post:
+ *     summary: Create or update many events at once
+ *     description: Events are matched on their id, so posting the same items again updates them instead of creating duplicates.
+ *     tags: [Events]
+ *     requestBody:
+ *       required: true
+ *       content:
+ *         application/json:
+ *           schema:
+ *             type: array
+ *             items:
+ *               $ref: '#/components/schemas/Event'
+ *     responses:
+ *       201:
+ *         description: Events stored successfully
+ *         content:
+ *           application/json:
+ *             schema:
+ *               type: object
+ *               properties:
+ *                 upserted:
+ *                   type: integer
+ *                   description: Number of new events
+ *                 matched:
+ *                   type: integer
+ *                   description: Number of existing events that were updated
+ *                 rejected:
+ *                   type: array
+ *                   description: Invalid events that were not stored
+ *                   items:
+ *                     type: object
+ *                     properties:
+ *                       index:
+ *                         type: integer
+ *                       details:
+ *                         type: string
+ *       400:
+ *         description: Body is not an array of events with ids, or none of them is valid
+ */
+router.post("/bulk", eventsController.createMany.bind(eventsController));
+
 /**
  * @swagger
  * /events/{id}:
@@ -37,7 +37,8 @@ app.use((req, res, next) => {
   next(); // Pass control to the next middleware or route handler
 });
 
-app.use(bodyParser.json());
+// Bulk inserts from ai-logic carry up to a few hundred items
+app.use(bodyParser.json({ limit: "5mb" }));
 app.use(bodyParser.urlencoded({ extended: true }));
 app.use("/posts", postsRouter);
 app.use("/events", eventsRouter);
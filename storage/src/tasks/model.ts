@@ -14,7 +14,7 @@ export interface Task {
 
 const taskSchema = new Schema<Task>({
   userId: { type: String, required: true, default: "" },
-  id: { type: String, required: true },
+  id: { type: String, required: true, index: true, unique: true },
   title: { type: String, required: true },
   updated: { type: String, required: true },
   notes: { type: String },
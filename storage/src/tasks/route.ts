@@ -142,6 +142,50 @@ router.get("/user/:userId", tasksController.getByUserId.bind(tasksController));
  */
 router.post("/", tasksController.create.bind(tasksController));
 
+/**
+ * @swagger
+ * /tasks/bulk:
+ *   post:
+ *     summary: Create or update many tasks at once
+ *     description: Tasks are matched on their id, so posting the same items again updates them instead of creating duplicates.
+ *     tags: [Tasks]
+ *     requestBody:
+ *       required: true
+ *       content:
+ *         application/json:
+ *           schema:
+ *             type: array
+ *             items:
+ *               $ref: '#/components/schemas/Task'
+ *     responses:
+ *       201:
+ *         description: Tasks stored successfully
+ *         content:
+ *           application/json:
+ *             schema:
+ *               type: object
+ *               properties:
+ *                 upserted:
+ *                   type: integer
+ *                   description: Number of new tasks
+ *                 matched:
+ *                   type: integer
+ *                   description: Number of existing tasks that were updated
+ *                 rejected:
+ *                   type: array
+ *                   description: Invalid tasks that were not stored
+ *                   items:
+ *                     type: object
+ *                     properties:
+ *                       index:
+ *                         type: integer
+ *                       details:
+ *                         type: string
+ *       400:
+ *         description: Body is not an array of tasks with ids, or none of them is valid
+ */
+router.post("/bulk", tasksController.createMany.bind(tasksController));
+
 /**
  * @swagger
  * /tasks/{id}:
@@ -0,0 +1,125 @@
+import time
+from typing import Any, List, NamedTuple, Optional
+
+
+class Window(NamedTuple):
+    """Text released for analysis and the messages to settle once it is done."""
+
+    job_id: Optional[str]
+    text: str
+    messages: List[Any]
+
+
+class TranscriptAssembler:
+    """Reassembles streamed transcript segments from the STT worker.
+
+    Segments of a job carry a `job_id`, a `seq` number and a `final` flag.
+    They are put back in order, and the text is released for analysis in
+    windows of at least `min_chars`, so a long meeting can be analyzed while
+    it is still being transcribed. Each segment is released exactly once, even
+    when the STT worker republishes a job after a redelivery.
+
+    The broker messages of buffered segments are held unacked until the
+    window containing them has been analyzed, so a restart loses no text.
+    A job has at most one window in flight and windows are settled in order,
+    so the acked segments of a job are always a prefix of it; after a restart
+    or a failed window, the job resumes from the first redelivered segment.
+    This needs every segment of a job to reach the same consumer, so
+    streaming is only supported with a single ai-producer replica.
+
+    At most `max_held` messages are held across all jobs before a window is
+    released early, which keeps prefetch slots free for the segments that
+    complete the windows.
+    """
+
+    def __init__(self, min_chars: int, ttl_seconds: int, max_held: int):
+        self.min_chars = min_chars
+        self.ttl_seconds = ttl_seconds
+        self.max_held = max_held
+        self.jobs = {}
+
+    @property
+    def held(self) -> int:
+        return sum(
+            len(job["segments"]) + len(job["pending"]) for job in self.jobs.values()
+        )
+
+    def add(self, payload: dict, message: Any) -> Optional[Window]:
+        """Record a segment and return a window ready for analysis, if any.
+
+        Duplicates come back as a window without a job, to be acked right away.
+        """
+        job_id, seq = payload["job_id"], payload["seq"]
+        job = self.jobs.get(job_id)
+        if job is None:
+            # A redelivered segment of an unknown job follows the last
+            # window this consumer, or one before a restart, acked
+            job = self.jobs[job_id] = {
+                "next_seq": seq if message.redelivered else 0,
+                "pending": {},
+                "segments": [],
+                "size": 0,
+                "final": False,
+                "in_flight": False,
+            }
+        job["updated"] = time.monotonic()
+
+        if seq < job["next_seq"] or seq in job["pending"]:
+            return Window(None, "", [message])
+        text = payload.get("transcription") or ""
+        job["pending"][seq] = (text, payload.get("final", False), message)
+
+        while not job["final"] and job["next_seq"] in job["pending"]:
+            text, job["final"], segment = job["pending"].pop(job["next_seq"])
+            job["next_seq"] += 1
+            job["segments"].append((text, segment))
+            job["size"] += len(text)
+        return self._release(job_id)
+
+    def done(self, job_id: Optional[str]) -> Optional[Window]:
+        """Mark the job's window as settled and return its next one, if ready."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job["in_flight"] = False
+        job["updated"] = time.monotonic()
+        return self._release(job_id)
+
+    def forget(self, job_id: str) -> List[Any]:
+        """Drop the job's state and return the messages it still holds.
+
+        Used when a window failed and is requeued: its segments and every
+        later one come back as redeliveries and the job resumes from them.
+        """
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return []
+        segments = [message for _, message in job["segments"]]
+        return segments + [message for _, _, message in job["pending"].values()]
+
+    def expire(self) -> List[Any]:
+        """Forget jobs no segment arrived for within the TTL; return their messages.
+
+        Finished jobs are kept until they expire so republished segments are
+        recognized as duplicates.
+        """
+        deadline = time.monotonic() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self.jobs.items()
+            if job["updated"] < deadline and not job["in_flight"]
+        ]
+        return [message for job_id in expired for message in self.forget(job_id)]
+
+    def _release(self, job_id: str) -> Optional[Window]:
+        job = self.jobs[job_id]
+        if job["in_flight"] or not job["segments"]:
+            return None
+        if not job["final"] and job["size"] < self.min_chars and self.held < self.max_held:
+            return None
+
+        texts = [text for text, _ in job["segments"] if text]
+        window = Window(job_id, " ".join(texts), [message for _, message in job["segments"]])
+        job["segments"], job["size"] = [], 0
+        job["in_flight"] = True
+        return window
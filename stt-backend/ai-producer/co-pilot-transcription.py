@@ -1,10 +1,17 @@
-import pika
+import aio_pika
+import asyncio
 import json
-import time
 import os
 import logging
+import random
+import signal
+import time
+import uuid
 from dotenv import load_dotenv
-import requests
+import httpx
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from assembler import TranscriptAssembler
 
 # Load environment variables
 load_dotenv()
@@ -18,46 +25,286 @@ logging.basicConfig(
 AMQP_URL = os.getenv("AMQP_URL")
 TRANSCRIPTIONS_QUEUE = os.getenv("TRANSCRIPTIONS_QUEUE", "transcriptions")
 
-params = pika.URLParameters(AMQP_URL)
+# ai-logic client parameters; the concurrency limit is also the prefetch count,
+# so the broker stops delivering while every slot is busy
+AI_LOGIC_URL = os.getenv("AI_LOGIC_URL", "http://ai-logic:8000")
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "8"))
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "300"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "4"))
+AI_RETRY_BACKOFF = float(os.getenv("AI_RETRY_BACKOFF", "1"))
+
+# Transcripts of the same user arriving within this window are sent to
+# ai-logic in one batch request; 0 sends each transcript on its own
+AI_BATCH_WINDOW_MS = int(os.getenv("AI_BATCH_WINDOW_MS", "500"))
+AI_BATCH_MAX_SIZE = int(os.getenv("AI_BATCH_MAX_SIZE", "8"))
+
+# Streamed transcripts are analyzed in windows of at least this many
+# characters. Their segments stay unacked until analyzed; past
+# PARTIAL_MAX_HELD held segments windows are released early, so prefetch
+# slots remain for the segments that complete them.
+PARTIAL_MIN_CHARS = int(os.getenv("PARTIAL_MIN_CHARS", "2000"))
+PARTIAL_JOB_TTL = int(os.getenv("PARTIAL_JOB_TTL", "3600"))
+PARTIAL_MAX_HELD = int(os.getenv("PARTIAL_MAX_HELD", str(AI_CONCURRENCY // 2)))
+
+# Prometheus exporter port; 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+assembler = TranscriptAssembler(PARTIAL_MIN_CHARS, PARTIAL_JOB_TTL, PARTIAL_MAX_HELD)
+
+STAGE_SECONDS = Histogram(
+    "ai_producer_stage_seconds",
+    "Time spent on one transcription in each stage",
+    ["stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+MESSAGES = Counter(
+    "ai_producer_messages_total", "Transcription messages handled, by outcome", ["outcome"]
+)
+QUEUE_LAG = Gauge(
+    "ai_producer_queue_lag_seconds",
+    "How long the most recent transcription waited in the queue",
+)
+
+
+class PermanentError(Exception):
+    """ai-logic rejected the request; retrying it would not help."""
+
+
+async def post_with_retries(client, path, payload, correlation_id=None):
+    """POST to ai-logic, retrying transient failures with backoff.
+
+    Connection errors, timeouts, 429 and 5xx responses are retried with
+    exponential backoff and jitter; other non-2xx responses are not.
+    """
+    for attempt in range(AI_MAX_RETRIES + 1):
+        try:
+            headers = {"X-Correlation-ID": correlation_id} if correlation_id else None
+            response = await client.post(path, json=payload, headers=headers)
+            if response.is_success:
+                return response
+            if response.status_code != 429 and response.status_code < 500:
+                raise PermanentError(
+                    f"ai-logic returned {response.status_code}: {response.text}"
+                )
+            error = f"ai-logic returned {response.status_code}"
+        except httpx.TransportError as e:
+            error = f"{type(e).__name__}: {e}"
+
+        if attempt == AI_MAX_RETRIES:
+            raise RuntimeError(f"Giving up after {attempt + 1} attempts: {error}")
+        delay = AI_RETRY_BACKOFF * 2**attempt * (1 + random.random())
+        logging.warning(f"Attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+class MicroBatcher:
+    """Groups transcripts per user and sends them to /process/batch together.
+
+    A user's first transcript opens a window of AI_BATCH_WINDOW_MS; everything
+    for that user arriving within it, up to AI_BATCH_MAX_SIZE items, goes in
+    one request, so ai-logic fetches the user's credentials once per batch.
+    """
+
+    def __init__(self, client, window_seconds, max_size):
+        self.client = client
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self.pending = {}
+        self.timers = {}
+        # Keeps flush tasks referenced until they finish
+        self.flushes = set()
+
+    async def submit(self, transcription, user_id, job_id, correlation_id):
+        """Wait until the transcript's batch has been processed; raise on failure."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self.pending.setdefault(user_id, [])
+        item = {
+            "transcript": transcription,
+            "user_id": user_id,
+            "job_id": job_id,
+            "correlation_id": correlation_id,
+        }
+        batch.append((item, future))
+
+        if len(batch) >= self.max_size:
+            self._flush_soon(user_id)
+        elif len(batch) == 1:
+            self.timers[user_id] = loop.call_later(
+                self.window_seconds, self._flush_soon, user_id
+            )
+        await future
 
+    def _flush_soon(self, user_id):
+        timer = self.timers.pop(user_id, None)
+        if timer:
+            timer.cancel()
+        batch = self.pending.pop(user_id, None)
+        if batch:
+            task = asyncio.create_task(self._flush(user_id, batch))
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
 
-def connect_rabbitmq():
-    while True:
+    async def _flush(self, user_id, batch):
+        items = [item for item, _ in batch]
         try:
-            connection = pika.BlockingConnection(params)
-            channel = connection.channel()
-            channel.queue_declare(queue=TRANSCRIPTIONS_QUEUE)
-            return connection, channel
-        except pika.exceptions.AMQPConnectionError:
-            logging.error("Connection failed, retrying in 5 seconds...")
-            time.sleep(5)
-
-
-def callback(ch, method, properties, body):
-    message = json.loads(body)
-    logging.info(f"Received message: {message}")
-    transcription = message.get("transcription")
-    user_id = message.get("user_id")
-    if transcription:
-        print(user_id)
-        requests.post(
-            "http://ai-logic:8000/process",
-            json={"transcript": transcription, "user_id": user_id},
+            response = await post_with_retries(self.client, "/process/batch", {"items": items})
+            results = response.json()["results"]
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        logging.info(f"Processed batch of {len(batch)} transcriptions for user {user_id}")
+        for (_, future), result in zip(batch, results):
+            if result["status"] == "ok":
+                future.set_result(None)
+            else:
+                future.set_exception(RuntimeError(result["error"]))
+
+
+async def post_transcript(client, batcher, transcription, user_id, job_id, correlation_id):
+    if batcher:
+        await batcher.submit(transcription, user_id, job_id, correlation_id)
+    else:
+        await post_with_retries(
+            client,
+            "/process",
+            {"transcript": transcription, "user_id": user_id, "job_id": job_id},
+            correlation_id,
         )
-        # transcription = mp3_to_text(file_path, ch)
-        # logging.info(f"Processed file: {file_path}\nTranscription: {transcription}")
-        print(f"Processed file: {transcription}")
 
 
-if __name__ == "__main__":
-    # Connect to RabbitMQ
-    connection, channel = connect_rabbitmq()
+async def handle_segment(client, batcher, payload, message, correlation_id):
+    """Buffer a streamed segment; analyze and settle the windows it completes.
+
+    Segments are acked only once the window containing them was accepted by
+    ai-logic. A failed window is requeued along with every later segment of
+    the job, which then resumes from the redelivered ones.
+    """
+    for held in assembler.expire():
+        logging.error(f"Dropping a segment of a stalled stream: {held.body}")
+        MESSAGES.labels("dropped").inc()
+        await held.nack(requeue=False)
+
+    user_id = payload.get("user_id")
+    window = assembler.add(payload, message)
+    while window:
+        try:
+            if window.text:
+                with STAGE_SECONDS.labels("analyze").time():
+                    await post_transcript(
+                        client, batcher, window.text, user_id, window.job_id, correlation_id
+                    )
+                logging.info(f"[{correlation_id}] Processed transcription for user {user_id}")
+        except Exception as e:
+            logging.error(f"Failed to process part of job {window.job_id}: {e}")
+            # Retry once on a later delivery, then drop it to avoid a poison loop
+            requeue = not isinstance(e, PermanentError) and not any(
+                held.redelivered for held in window.messages
+            )
+            settled = window.messages
+            if requeue:
+                settled = settled + assembler.forget(window.job_id)
+            MESSAGES.labels("requeued" if requeue else "dropped").inc(len(settled))
+            for held in settled:
+                await held.nack(requeue=requeue)
+            if requeue:
+                return
+        else:
+            MESSAGES.labels("ok").inc(len(window.messages))
+            for held in window.messages:
+                await held.ack()
+        window = assembler.done(window.job_id)
+
+
+async def handle_message(client, batcher, message):
+    """Analyze one transcription message; ack only once ai-logic accepted it."""
     try:
-        logging.info("Waiting for messages. To exit press CTRL+C")
-        channel.basic_consume(
-            queue=TRANSCRIPTIONS_QUEUE, on_message_callback=callback, auto_ack=True
+        payload = json.loads(message.body)
+        correlation_id = (
+            payload.get("correlation_id") or message.correlation_id or uuid.uuid4().hex
         )
-        channel.start_consuming()
-    except pika.exceptions.AMQPConnectionError:
-        logging.error("Lost connection to RabbitMQ, reconnecting...")
-        time.sleep(5)
+        logging.info(f"[{correlation_id}] Received message: {payload}")
+        if "enqueued_at" in payload:
+            QUEUE_LAG.set(max(0.0, time.time() - payload["enqueued_at"]))
+        if "job_id" in payload:
+            # Streamed segment, settled with the window containing it
+            segment = payload
+        else:
+            segment = None
+            transcription = payload.get("transcription")
+            user_id = payload.get("user_id")
+            # ai-logic skips action items already created for the same
+            # recording, so redelivered messages do not duplicate them
+            job_id = payload.get("file")
+            if transcription:
+                with STAGE_SECONDS.labels("analyze").time():
+                    await post_transcript(
+                        client, batcher, transcription, user_id, job_id, correlation_id
+                    )
+                logging.info(f"[{correlation_id}] Processed transcription for user {user_id}")
+    except Exception as e:
+        logging.error(f"Failed to process message: {e}")
+        # Retry once on a later delivery, then drop it to avoid a poison loop
+        requeue = not message.redelivered and not isinstance(e, PermanentError)
+        MESSAGES.labels("requeued" if requeue else "dropped").inc()
+        await message.nack(requeue=requeue)
+        return
+    if segment:
+        await handle_segment(client, batcher, segment, message, correlation_id)
+        return
+    MESSAGES.labels("ok").inc()
+    await message.ack()
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
+
+    # Reconnects on its own after broker restarts
+    connection = await aio_pika.connect_robust(AMQP_URL)
+    limits = httpx.Limits(
+        max_connections=AI_CONCURRENCY, max_keepalive_connections=AI_CONCURRENCY
+    )
+    in_flight = set()
+
+    async with connection, httpx.AsyncClient(
+        base_url=AI_LOGIC_URL, timeout=AI_REQUEST_TIMEOUT, limits=limits
+    ) as client:
+        batcher = (
+            MicroBatcher(client, AI_BATCH_WINDOW_MS / 1000, AI_BATCH_MAX_SIZE)
+            if AI_BATCH_WINDOW_MS
+            else None
+        )
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=AI_CONCURRENCY)
+        queue = await channel.declare_queue(TRANSCRIPTIONS_QUEUE)
+
+        async def on_message(message):
+            task = asyncio.current_task()
+            in_flight.add(task)
+            try:
+                await handle_message(client, batcher, message)
+            finally:
+                in_flight.discard(task)
+
+        consumer_tag = await queue.consume(on_message)
+        logging.info("Waiting for messages. To exit press CTRL+C")
+        await stopping.wait()
+
+        # Stop deliveries, finish in-flight analyses; unacked messages are
+        # requeued by the broker when the channel closes
+        logging.info("Shutting down, finishing in-flight messages...")
+        await queue.cancel(consumer_tag)
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
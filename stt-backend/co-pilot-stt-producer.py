@@ -1,9 +1,21 @@
-import pika
+import argparse
+import asyncio
+import glob
+import hashlib
 import json
-import time
-import os
 import logging
+import mimetypes
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import aio_pika
 from dotenv import load_dotenv
+from google.api_core.exceptions import PreconditionFailed
+from google.cloud import storage
 
 # Load environment variables
 load_dotenv()
@@ -15,70 +27,245 @@ logging.basicConfig(
 
 # RabbitMQ connection parameters
 AMQP_URL = os.getenv("AMQP_URL")
-if not AMQP_URL:
-    logging.error("AMQP_URL not found in environment variables")
-    exit(1)
-
 AUDIO_FILES_QUEUE = os.getenv("AUDIO_FILES_QUEUE", "audio_files")
 
-params = pika.URLParameters(AMQP_URL)
+# Bucket the STT workers read from, shared with the frontend's uploads
+GCP_BUCKET_NAME = os.getenv("GCP_BUCKET_NAME", "tl-copilot-files")
+INGEST_PREFIX = os.getenv("INGEST_PREFIX", "ingest/")
+
+# Parallel uploads, and the chunk size of each resumable upload; a failed
+# chunk is retried on its own instead of restarting the file. Must be a
+# multiple of 256 KiB.
+INGEST_UPLOADS = int(os.getenv("INGEST_UPLOADS", "8"))
+INGEST_CHUNK_BYTES = int(os.getenv("INGEST_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+# Jobs are published in batches whose confirms are awaited together
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+
+# The formats co-pilot-stt.py accepts
+AUDIO_EXTENSIONS = (".mp3", ".wav")
+
+_local = threading.local()
 
 
-def connect_rabbitmq():
-    """Establish connection to RabbitMQ server and return connection and channel"""
-    while True:
-        try:
-            connection = pika.BlockingConnection(params)
-            channel = connection.channel()
-            channel.queue_declare(queue=AUDIO_FILES_QUEUE)
-            return connection, channel
-        except pika.exceptions.AMQPConnectionError:
-            logging.error("Connection failed, retrying in 5 seconds...")
-            time.sleep(5)
+def get_bucket():
+    """One storage client per upload thread, each with its own connection pool."""
+    if not hasattr(_local, "bucket"):
+        _local.bucket = storage.Client().bucket(GCP_BUCKET_NAME)
+    return _local.bucket
 
 
-def send_file_for_transcription(file_path):
-    """Send a file path to the audio_files queue for processing"""
-    # Validate file exists
-    if not os.path.exists(file_path):
-        logging.error(f"File not found: {file_path}")
-        return False
+def find_files(patterns):
+    """Expand directories (recursively) and globs into sorted audio file paths."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        if not matches:
+            logging.warning(f"No files match {pattern}")
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(AUDIO_EXTENSIONS):
+                paths.add(os.path.abspath(path))
+            elif os.path.isfile(path) and not os.path.isdir(pattern):
+                logging.warning(f"Skipping {path}: only .mp3 and .wav are supported")
+    return sorted(paths)
 
-    # Validate file is an MP3
-    if not file_path.endswith(".mp3"):
-        logging.error(f"File must be in MP3 format: {file_path}")
-        return False
 
-    # Use absolute path to ensure correct processing
-    abs_file_path = os.path.abspath(file_path)
+def blob_name(path):
+    """Name the blob after the file's content, so re-runs find earlier uploads."""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    filename = os.path.basename(path).replace(" ", "_")
+    return f"{INGEST_PREFIX}{digest.hexdigest()[:16]}-{filename}"
 
-    connection, channel = connect_rabbitmq()
 
+def upload(path):
+    """Upload `path` unless the bucket already has it; return its gs:// URI and
+    whether it was uploaded now."""
+    name = blob_name(path)
+    blob = get_bucket().blob(name, chunk_size=INGEST_CHUNK_BYTES)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
     try:
-        message = json.dumps({"file": abs_file_path})
-        channel.basic_publish(exchange="", routing_key=AUDIO_FILES_QUEUE, body=message)
-        logging.info(f"Sent {abs_file_path} for transcription")
-        connection.close()
-        return True
-    except Exception as e:
-        logging.error(f"Error sending message: {e}")
-        connection.close()
-        return False
-
-
-# List of MP3 files to send for transcription
-files_to_process = [
-    # Add your file paths here, for example:
-    "my_audio.mp3",
-]
+        # Create-only, which also makes the upload safe for the library to retry
+        blob.upload_from_filename(path, content_type=content_type, if_generation_match=0)
+        uploaded = True
+    except PreconditionFailed:
+        uploaded = False
+    return f"gs://{GCP_BUCKET_NAME}/{name}", uploaded
 
-if __name__ == "__main__":
-    success_count = 0
 
-    for file_path in files_to_process:
-        if send_file_for_transcription(file_path):
-            success_count += 1
+def load_journal(path):
+    """gs:// URIs already published by earlier runs with the same journal."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {json.loads(line)["file"] for line in f if line.strip()}
+
+
+class Stats:
+    def __init__(self, total):
+        self.total = total
+        self.started = time.monotonic()
+        self.uploaded = 0
+        self.uploaded_bytes = 0
+        self.already_uploaded = 0
+        self.already_published = 0
+        self.published = 0
+        self.publish_seconds = 0.0
+        self.failed = []
+
+    def progress(self):
+        done = self.published + self.already_published + len(self.failed)
+        elapsed = time.monotonic() - self.started
+        logging.info(
+            f"{done}/{self.total} files done, "
+            f"{self.uploaded_bytes / 1024 / 1024 / elapsed:.1f} MB/s uploaded"
+        )
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        megabytes = self.uploaded_bytes / 1024 / 1024
+        logging.info(
+            f"Ingested {self.total} files in {elapsed:.1f}s: "
+            f"{self.uploaded} uploaded ({megabytes:.1f} MB, {megabytes / elapsed:.1f} MB/s), "
+            f"{self.already_uploaded} already in gs://{GCP_BUCKET_NAME}, "
+            f"{self.published} published ({self.published / elapsed:.1f} jobs/s, "
+            f"{self.publish_seconds:.1f}s waiting for confirms), "
+            f"{self.already_published} published by an earlier run, "
+            f"{len(self.failed)} failed"
+        )
+        for path, error in self.failed:
+            logging.error(f"Failed: {path}: {error}")
+
+
+async def publish_batch(exchange, batch, user_id, stats, journal):
+    """Publish `batch` of (path, gs:// URI) and wait for every broker confirm.
+
+    Publishes are pipelined: the whole batch is sent before the confirms are
+    awaited, so a batch costs about one round trip instead of one per job.
+    """
+    start = time.monotonic()
+    messages = []
+    for path, uri in batch:
+        correlation_id = uuid.uuid4().hex
+        body = {
+            "file": uri,
+            "user_id": user_id,
+            "correlation_id": correlation_id,
+            "enqueued_at": time.time(),
+        }
+        messages.append(
+            aio_pika.Message(
+                json.dumps(body).encode(),
+                content_type="application/json",
+                correlation_id=correlation_id,
+            )
+        )
+    results = await asyncio.gather(
+        *(exchange.publish(message, routing_key=AUDIO_FILES_QUEUE) for message in messages),
+        return_exceptions=True,
+    )
+    stats.publish_seconds += time.monotonic() - start
+
+    for (path, uri), result in zip(batch, results):
+        if isinstance(result, Exception):
+            stats.failed.append((path, f"not confirmed by the broker: {result}"))
+            continue
+        stats.published += 1
+        if journal:
+            journal.write(json.dumps({"file": uri, "path": path}) + "\n")
+    if journal:
+        journal.flush()
+
+
+async def ingest(paths, user_id, journal_path):
+    published = load_journal(journal_path)
+    stats = Stats(len(paths))
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=INGEST_UPLOADS)
+
+    # One connection and channel for every job; with publisher confirms the
+    # broker acknowledges each message once it has taken responsibility for it
+    connection = await aio_pika.connect_robust(AMQP_URL)
+    journal = open(journal_path, "a") if journal_path else None
+    try:
+        async with connection:
+            channel = await connection.channel(publisher_confirms=True)
+            await channel.declare_queue(AUDIO_FILES_QUEUE)
+
+            async def upload_one(path):
+                try:
+                    return path, await loop.run_in_executor(executor, upload, path), None
+                except Exception as e:
+                    return path, None, e
+
+            batch = []
+            for next_upload in asyncio.as_completed([upload_one(path) for path in paths]):
+                path, result, error = await next_upload
+                if error is not None:
+                    stats.failed.append((path, f"upload failed: {error}"))
+                    continue
+                uri, uploaded = result
+                if uploaded:
+                    stats.uploaded += 1
+                    stats.uploaded_bytes += os.path.getsize(path)
+                else:
+                    stats.already_uploaded += 1
+                if uri in published:
+                    stats.already_published += 1
+                    continue
+                batch.append((path, uri))
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    await publish_batch(channel.default_exchange, batch, user_id, stats, journal)
+                    batch = []
+                    stats.progress()
+            if batch:
+                await publish_batch(channel.default_exchange, batch, user_id, stats, journal)
+    finally:
+        executor.shutdown()
+        if journal:
+            journal.close()
+
+    stats.report()
+    return not stats.failed
 
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Upload recordings to GCS and queue them for transcription."
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="audio files, directories (searched recursively) or globs"
+    )
+    parser.add_argument(
+        "--user-id", required=True, help="user whose calendar and tasks receive the results"
+    )
+    parser.add_argument(
+        "--journal",
+        help="file recording published jobs; re-runs with the same journal skip them",
+    )
+    args = parser.parse_args()
+
+    if not AMQP_URL:
+        logging.error("AMQP_URL not found in environment variables")
+        sys.exit(1)
+
+    paths = find_files(args.paths)
+    if not paths:
+        logging.error("No .mp3 or .wav files to ingest")
+        sys.exit(1)
     logging.info(
-        f"Successfully queued {success_count} of {len(files_to_process)} files for transcription"
+        f"Ingesting {len(paths)} files into gs://{GCP_BUCKET_NAME}/{INGEST_PREFIX} "
+        f"with {INGEST_UPLOADS} parallel uploads"
     )
+
+    if not asyncio.run(ingest(paths, args.user_id, args.journal)):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
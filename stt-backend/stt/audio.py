@@ -0,0 +1,142 @@
+import subprocess
+import threading
+
+from pydub import AudioSegment
+
+# Loudness is measured over windows of this length when looking for pauses
+LEVEL_WINDOW_MS = 100
+
+# Decoded audio is always 16-bit mono PCM
+SAMPLE_WIDTH = 2
+
+
+def silence_threshold(audio: AudioSegment, silence_offset_db: int = 16) -> float:
+    """Loudness (dBFS) under which a window of `audio` counts as a pause."""
+    return audio.dBFS - silence_offset_db
+
+
+def find_cut(window: AudioSegment, threshold: float) -> int:
+    """Return the offset (ms) at which to end a chunk starting at `window`.
+
+    The cut is placed in the middle of the last quiet level window within the
+    second half of `window`, so words are not split in two. When no level window
+    is quiet enough the quietest one is used instead.
+    """
+    first = (len(window) // 2) // LEVEL_WINDOW_MS
+    last = len(window) // LEVEL_WINDOW_MS - 1
+    levels = {
+        i: window[i * LEVEL_WINDOW_MS : (i + 1) * LEVEL_WINDOW_MS].dBFS
+        for i in range(first, last + 1)
+    }
+
+    candidates = range(last, first - 1, -1)
+    cut = next((i for i in candidates if levels[i] <= threshold), None)
+    if cut is None:
+        cut = min(candidates, key=levels.__getitem__)
+    return cut * LEVEL_WINDOW_MS + LEVEL_WINDOW_MS // 2
+
+
+def pcm_segment(data: bytes, sample_rate: int) -> AudioSegment:
+    """Wrap raw 16-bit mono PCM bytes in an AudioSegment without copying to disk."""
+    return AudioSegment(
+        data=data, sample_width=SAMPLE_WIDTH, frame_rate=sample_rate, channels=1
+    )
+
+
+def normalize(segment: AudioSegment, sample_rate: int) -> AudioSegment:
+    """Downmix and resample to 16-bit mono PCM at `sample_rate`.
+
+    Decoder output is already in this format, so this only converts audio
+    that reaches a recognizer some other way.
+    """
+    if segment.channels != 1:
+        segment = segment.set_channels(1)
+    if segment.sample_width != SAMPLE_WIDTH:
+        segment = segment.set_sample_width(SAMPLE_WIDTH)
+    if segment.frame_rate != sample_rate:
+        segment = segment.set_frame_rate(sample_rate)
+    return segment
+
+
+def decode_stream(reader, sample_rate: int, frame_ms: int = 1000, read_size: int = 256 * 1024):
+    """Decode a compressed audio byte stream into fixed-size mono PCM frames.
+
+    `reader` is any binary file-like object (e.g. a GCS `BlobReader`). It is fed
+    to ffmpeg from a background thread while frames are read from ffmpeg's
+    stdout, so neither the encoded file nor the decoded audio is ever held in
+    memory or written to disk as a whole.
+    """
+    process = subprocess.Popen(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(sample_rate),
+            "pipe:1",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    feed_errors = []
+
+    def feed():
+        try:
+            while data := reader.read(read_size):
+                process.stdin.write(data)
+        except (BrokenPipeError, ValueError):
+            # ffmpeg exited early or the reader was closed; reported below
+            pass
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    feeder.start()
+
+    frame_bytes = sample_rate * SAMPLE_WIDTH * frame_ms // 1000
+    try:
+        while frame := process.stdout.read(frame_bytes):
+            yield frame
+        process.wait()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        feeder.join()
+
+    if feed_errors:
+        raise feed_errors[0]
+    if process.returncode != 0:
+        error = process.stderr.read().decode(errors="replace").strip()
+        raise RuntimeError(f"ffmpeg exited with code {process.returncode}: {error}")
+
+
+def stream_chunks(frames, sample_rate: int, max_chunk_ms: int, silence_offset_db: int = 16):
+    """Group PCM frames into chunks of at most `max_chunk_ms`, cutting at pauses.
+
+    At most one chunk worth of audio is buffered at any time, so memory use
+    does not depend on the length of the recording.
+    """
+    if max_chunk_ms < 2 * LEVEL_WINDOW_MS:
+        raise ValueError(f"max_chunk_ms must be at least {2 * LEVEL_WINDOW_MS}")
+
+    bytes_per_ms = sample_rate * SAMPLE_WIDTH / 1000
+    max_bytes = int(max_chunk_ms * bytes_per_ms) // SAMPLE_WIDTH * SAMPLE_WIDTH
+    buffer = bytearray()
+
+    for frame in frames:
+        buffer.extend(frame)
+        while len(buffer) >= max_bytes:
+            window = pcm_segment(bytes(buffer[:max_bytes]), sample_rate)
+            cut = find_cut(window, silence_threshold(window, silence_offset_db))
+            cut_bytes = int(cut * bytes_per_ms) // SAMPLE_WIDTH * SAMPLE_WIDTH
+            yield pcm_segment(bytes(buffer[:cut_bytes]), sample_rate)
+            del buffer[:cut_bytes]
+
+    if buffer:
+        yield pcm_segment(bytes(buffer), sample_rate)
@@ -0,0 +1,148 @@
+import hashlib
+import logging
+import os
+import time
+from typing import Optional
+
+
+def content_key(blob, backend: str) -> Optional[str]:
+    """Cache key for a GCS blob, taken from its metadata without downloading it.
+
+    Uses the MD5 GCS stores for simple uploads, falling back to CRC32C and size
+    for composite objects that have no MD5. The recognizer backend is part of
+    the key because different backends produce different transcripts.
+    """
+    if blob.md5_hash:
+        digest = f"md5:{blob.md5_hash}"
+    elif blob.crc32c:
+        digest = f"crc32c:{blob.crc32c}:{blob.size}"
+    else:
+        return None
+    return f"{backend}:{digest}"
+
+
+class TranscriptionCache:
+    """Transcript store keyed on audio content, evicting by total size."""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, text: str) -> None:
+        raise NotImplementedError
+
+
+class LocalCache(TranscriptionCache):
+    """Directory-backed cache shared by all consumer processes in a container.
+
+    Entries are evicted least recently used first; a hit refreshes the file's
+    modification time.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return text
+
+    def set(self, key, text):
+        path = self._path(key)
+        # Write then rename so concurrent readers never see a partial entry
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class RedisCache(TranscriptionCache):
+    """Redis-backed cache shared across containers.
+
+    Access times live in a sorted set and entry sizes in a hash so the least
+    recently used transcripts can be dropped once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, url: str, max_bytes: int, prefix: str = "stt:transcript:"):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.index_key = f"{prefix}index"
+        self.sizes_key = f"{prefix}sizes"
+        self.total_key = f"{prefix}total"
+
+    def get(self, key):
+        text = self.redis.get(self.prefix + key)
+        if text is not None:
+            self.redis.zadd(self.index_key, {key: time.time()})
+        return text
+
+    def set(self, key, text):
+        size = len(text.encode("utf-8"))
+        previous = self.redis.hget(self.sizes_key, key)
+        pipe = self.redis.pipeline()
+        pipe.set(self.prefix + key, text)
+        pipe.zadd(self.index_key, {key: time.time()})
+        pipe.hset(self.sizes_key, key, size)
+        pipe.incrby(self.total_key, size - int(previous or 0))
+        pipe.execute()
+        self._evict()
+
+    def _evict(self):
+        while int(self.redis.get(self.total_key) or 0) > self.max_bytes:
+            oldest = self.redis.zpopmin(self.index_key)
+            if not oldest:
+                break
+            key = oldest[0][0]
+            size = int(self.redis.hget(self.sizes_key, key) or 0)
+            pipe = self.redis.pipeline()
+            pipe.delete(self.prefix + key)
+            pipe.hdel(self.sizes_key, key)
+            pipe.decrby(self.total_key, size)
+            pipe.execute()
+
+
+def create_cache(kind: str) -> Optional[TranscriptionCache]:
+    """Build the cache selected by STT_CACHE, or None when caching is off."""
+    max_bytes = int(os.getenv("STT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    if kind == "local":
+        return LocalCache(os.getenv("STT_CACHE_DIR", "/tmp/stt-cache"), max_bytes)
+    if kind == "redis":
+        return RedisCache(os.getenv("REDIS_URL", "redis://redis:6379/0"), max_bytes)
+    if kind == "none":
+        return None
+    logging.error(f"Unknown STT_CACHE {kind!r}, transcription cache disabled")
+    return None
@@ -1,13 +1,26 @@
-import speech_recognition as sr
-from pydub import AudioSegment
 import pika
 import json
 import time
 import os
 import logging
-import tempfile
+import functools
+import hashlib
+import multiprocessing
+import queue
+import signal
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from google.cloud import storage
 from dotenv import load_dotenv
+from prometheus_client import multiprocess
+
+from audio import decode_stream, stream_chunks
+from cache import content_key, create_cache
+from metrics import JOBS, QUEUE_LAG, TimedReader, new_correlation_id, observe, serve, span
+from recognizers import get_recognizer
+from vad import VoiceActivityFilter
 
 # Load environment variables
 load_dotenv()
@@ -22,8 +35,51 @@ AMQP_URL = os.getenv("AMQP_URL")
 TRANSCRIPTIONS_QUEUE = os.getenv("TRANSCRIPTIONS_QUEUE", "transcriptions")
 AUDIO_FILES_QUEUE = os.getenv("AUDIO_FILES_QUEUE", "audio_files")
 
+# Streaming decode parameters
+STT_FRAME_MS = int(os.getenv("STT_FRAME_MS", "1000"))
+STT_READ_CHUNK_BYTES = int(os.getenv("STT_READ_CHUNK_BYTES", str(1024 * 1024)))
+STT_DECODE_AHEAD_CHUNKS = int(os.getenv("STT_DECODE_AHEAD_CHUNKS", "8"))
+
+# Voice activity detection drops windows more than STT_VAD_OFFSET_DB below
+# the recording's level so far, and anything under STT_VAD_FLOOR_DB (dBFS)
+STT_VAD = os.getenv("STT_VAD", "true").lower() == "true"
+STT_VAD_OFFSET_DB = float(os.getenv("STT_VAD_OFFSET_DB", "20"))
+STT_VAD_FLOOR_DB = float(os.getenv("STT_VAD_FLOOR_DB", "-70"))
+# Share of a recording the VAD may remove before its result is distrusted
+VAD_SUSPECT_FRACTION = 0.9
+
+# Chunked recognition parameters
+STT_BACKEND = os.getenv("STT_BACKEND", "google")
+STT_WORKERS = int(os.getenv("STT_WORKERS", "4"))
+STT_MAX_PENDING_CHUNKS = int(
+    os.getenv("STT_MAX_PENDING_CHUNKS", str(STT_WORKERS * 2))
+)
+STT_CHUNK_MAX_MS = int(os.getenv("STT_CHUNK_MAX_MS", "30000"))
+STT_SILENCE_OFFSET_DB = int(os.getenv("STT_SILENCE_OFFSET_DB", "16"))
+
+# Publish each recognized segment as soon as it is ready instead of one
+# message per recording
+STT_STREAM_PARTIALS = os.getenv("STT_STREAM_PARTIALS", "false").lower() == "true"
+
+# Transcription cache: "none", "local" or "redis"
+STT_CACHE = os.getenv("STT_CACHE", "local")
+
+# Consumer pool parameters
+STT_PROCESSES = int(os.getenv("STT_PROCESSES", str(len(os.sched_getaffinity(0)))))
+# Messages are acked only once published, so a prefetch of at least 2 is
+# what lets the next job decode while the current one is being recognized
+STT_PREFETCH = int(os.getenv("STT_PREFETCH", "2"))
+
+# Prometheus exporter port; 0 disables it
+STT_METRICS_PORT = int(os.getenv("STT_METRICS_PORT", "9100"))
+
 params = pika.URLParameters(AMQP_URL)
 
+# Set by SIGTERM/SIGINT; consumers stop taking new jobs and drain in-flight ones
+shutting_down = False
+# Jobs delivered on this process's connection that are not yet acked or requeued
+in_flight_jobs = 0
+
 
 def connect_rabbitmq():
     while True:
@@ -38,106 +94,481 @@ def connect_rabbitmq():
             time.sleep(5)
 
 
-def mp3_to_text(gcs_uri, channel, user_id):  # Changed mp3_path to gcs_uri
-    logging.info(f"Processing file from GCS: {gcs_uri}")
+def batched(chunks, size):
+    """Group an iterable of chunks into lists of up to `size` chunks."""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 
-    # Initialize GCS client
-    storage_client = storage.Client()
+def transcribe_chunked(chunks, gcs_uri, executor, on_text=None):
+    """Recognize `chunks` concurrently and join the text in order.
 
-    # Parse GCS URI
-    if not gcs_uri.startswith("gs://"):
-        logging.error(f"Invalid GCS URI: {gcs_uri}. It must start with 'gs://'")
-        return "Error: Invalid GCS URI"
+    Returns the text and whether every chunk was recognized; partial
+    transcripts are still published but never cached. `on_text` is called
+    with each chunk's text, in order, as soon as it and every chunk before it
+    have been recognized.
 
-    bucket_name, blob_name = gcs_uri.replace("gs://", "").split("/", 1)
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
+    Chunks are grouped into batches of the backend's `batch_size` and pulled
+    from the iterable only as `executor` workers free up, so at most
+    `STT_MAX_PENDING_CHUNKS` decoded chunks are held in memory at once.
+    """
+    recognizer = get_recognizer(STT_BACKEND)
+    max_pending_batches = max(1, STT_MAX_PENDING_CHUNKS // recognizer.batch_size)
 
-    text = "Error processing file"
-    temp_dir = tempfile.mkdtemp()
-    local_audio_path = os.path.join(temp_dir, os.path.basename(blob_name))
+    results = []
+    payload_bytes = 0
 
+    def collect(future):
+        nonlocal payload_bytes
+        for result in future.result():
+            results.append(result.text)
+            payload_bytes += result.payload_bytes
+            if on_text and result.text:
+                on_text(result.text)
+
+    pending = deque()
+    for batch in batched(chunks, recognizer.batch_size):
+        if len(pending) >= max_pending_batches:
+            collect(pending.popleft())
+        pending.append(executor.submit(recognizer.transcribe_batch, batch))
+    for future in pending:
+        collect(future)
+
+    logging.info(
+        f"Recognized {len(results)} chunks of {gcs_uri} with {STT_WORKERS} "
+        f"{recognizer.name} workers, sending {payload_bytes} bytes of "
+        f"{recognizer.payload_format} at {recognizer.sample_rate} Hz mono"
+    )
+    failed = results.count(None)
+    if failed:
+        logging.error(f"{failed} of {len(results)} chunks failed for {gcs_uri}")
+    if results and failed == len(results):
+        return "Error with recognition service", False
+
+    text = " ".join(result for result in results if result)
+    if not text:
+        logging.warning(f"Speech not recognized for {gcs_uri}")
+        return "Speech not recognized", not failed
+
+    logging.info(f"Transcription successful: {text}")
+    return text, not failed
+
+
+@functools.lru_cache(maxsize=None)
+def get_transcription_cache():
+    """Build the transcription cache once per consumer process."""
+    return create_cache(STT_CACHE)
+
+
+def cached_transcription(key):
+    cache = get_transcription_cache()
+    if cache is None or key is None:
+        return None
     try:
-        # Download file from GCS
-        blob.download_to_filename(local_audio_path)
-        logging.info(f"Successfully downloaded {gcs_uri} to {local_audio_path}")
-
-        file_extension = os.path.splitext(local_audio_path)[1].lower()
-        wav_path = local_audio_path
-
-        if file_extension == ".mp3":
-            # Convert MP3 to WAV
-            audio = AudioSegment.from_mp3(local_audio_path)
-            wav_path = os.path.join(
-                temp_dir, os.path.basename(local_audio_path).replace(".mp3", ".wav")
-            )
-            audio.export(wav_path, format="wav")
-            logging.info(f"Converted {local_audio_path} to {wav_path}")
-        elif file_extension != ".wav":
-            logging.error(
-                f"Unsupported file format: {file_extension}. Only .mp3 and .wav are supported."
-            )
-            return f"Error: Unsupported file format {file_extension}"
+        return cache.get(key)
+    except Exception as e:
+        logging.error(f"Transcription cache lookup failed: {e}")
+        return None
 
-        # Recognize speech
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(wav_path) as source:
-            audio_data = recognizer.record(source)
+
+def cache_transcription(key, text):
+    cache = get_transcription_cache()
+    if cache is None or key is None:
+        return
+    try:
+        cache.set(key, text)
+    except Exception as e:
+        logging.error(f"Failed to cache transcription: {e}")
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage_client():
+    """One GCS client per consumer process so its HTTP connections are reused."""
+    return storage.Client()
+
+
+# Closes a job's chunk queue
+END_OF_AUDIO = object()
+
+
+class Job:
+    """An audio message moving through the decode and recognize stages.
+
+    Everything touching the channel is scheduled back onto the connection
+    thread, which keeps serving heartbeats while the stages run.
+    """
+
+    def __init__(self, connection, channel, method, body):
+        self.connection = connection
+        self.channel = channel
+        self.method = method
+        self.body = body
+        self.gcs_uri = None
+        self.user_id = None
+        # Stamped when the recording was enqueued and carried to every
+        # message and log line about it
+        self.correlation_id = None
+        self.blob = None
+        self.cache_key = None
+        # Cleared when the transcript should not be reused for this audio
+        self.cacheable = True
+        # Set directly on cache hits and errors, otherwise by recognition
+        self.text = None
+        # Sequence number of the next transcription message for this job
+        self.seq = 0
+        # Decoded chunks waiting for recognition; bounds how far decode runs ahead
+        self.chunks = queue.Queue(maxsize=STT_DECODE_AHEAD_CHUNKS)
+        # Set once recognition has taken END_OF_AUDIO off the chunk queue
+        self.decoded = False
+
+    def on_connection(self, fn, *args, **kwargs):
+        self.connection.add_callback_threadsafe(functools.partial(fn, *args, **kwargs))
+
+    def settle(self, ack, requeue=False):
+        def run():
+            global in_flight_jobs
+            in_flight_jobs -= 1
+            if ack:
+                self.channel.basic_ack(delivery_tag=self.method.delivery_tag)
+            else:
+                self.channel.basic_nack(
+                    delivery_tag=self.method.delivery_tag, requeue=requeue
+                )
 
         try:
-            text = recognizer.recognize_google(audio_data)
-            logging.info(f"Transcription successful: {text}")
-        except sr.UnknownValueError:
-            text = "Speech not recognized"
-            logging.warning(f"Speech not recognized for {gcs_uri}")
-        except sr.RequestError as e:
-            text = "Error with recognition service"
-            logging.error(f"Error with recognition service for {gcs_uri}: {e}")
+            self.on_connection(run)
+        except pika.exceptions.AMQPError as e:
+            logging.error(f"Connection lost before settling message, it will be redelivered: {e}")
+
+    @property
+    def job_id(self):
+        # Derived from the upload so a redelivered job republishes the same ids
+        return hashlib.sha1(f"{self.gcs_uri}:{self.user_id}".encode()).hexdigest()[:16]
+
+    def publish(self, text, final=False):
+        message = {
+            "file": self.gcs_uri,
+            "transcription": text,
+            "user_id": self.user_id,
+            "correlation_id": self.correlation_id,
+            "enqueued_at": time.time(),
+        }
+        if STT_STREAM_PARTIALS:
+            message.update({"job_id": self.job_id, "seq": self.seq, "final": final})
+            self.seq += 1
+        self.on_connection(
+            self.channel.basic_publish,
+            exchange="",
+            routing_key=TRANSCRIPTIONS_QUEUE,
+            body=json.dumps(message),
+            properties=pika.BasicProperties(correlation_id=self.correlation_id),
+        )
+
+    def publish_partial(self, text):
+        """Publish one recognized segment ahead of the rest of the recording."""
+        try:
+            self.publish(text)
+        except pika.exceptions.AMQPError as e:
+            logging.error(f"Connection lost before publishing part of {self.gcs_uri}: {e}")
+
+    def finish(self):
+        """Publish the transcription, then ack the audio message.
+
+        When segments were already streamed, the final message only closes the
+        stream instead of repeating their text.
+        """
+        try:
+            with span("publish", self.correlation_id):
+                self.publish("" if self.seq else self.text, final=True)
+        except pika.exceptions.AMQPError as e:
+            logging.error(f"Connection lost before publishing {self.gcs_uri}: {e}")
+            JOBS.labels("lost").inc()
+            return
+        JOBS.labels("error" if self.text.startswith("Error") else "ok").inc()
+        # Callbacks run in order, so the ack always follows the publish
+        self.settle(ack=True)
+
+    def iter_chunks(self):
+        while (chunk := self.chunks.get()) is not END_OF_AUDIO:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+        self.decoded = True
 
+    def discard_chunks(self):
+        """Drain the chunk queue so a blocked decode stage can finish the job.
+
+        Recognition can fail after the last chunk was read, in which case
+        the decode stage is already done and nothing more will arrive.
+        """
+        while not self.decoded:
+            self.decoded = self.chunks.get() is END_OF_AUDIO
+
+
+def prepare_job(job):
+    """Parse the message and resolve its blob. Returns False to drop the job.
+
+    Only the blob's metadata is fetched here; its hash identifies re-uploads,
+    and a cached transcription is set on the job without any download.
+    """
+    message = json.loads(job.body)
+    job.correlation_id = message.get("correlation_id") or new_correlation_id()
+    logging.info(f"[{job.correlation_id}] Received message: {message}")
+    if "enqueued_at" in message:
+        QUEUE_LAG.set(max(0.0, time.time() - message["enqueued_at"]))
+    job.gcs_uri = message.get("file")
+    job.user_id = message.get("user_id")
+    if not job.gcs_uri:
+        return False
+
+    if not job.gcs_uri.startswith("gs://"):
+        logging.error(f"Invalid GCS URI: {job.gcs_uri}. It must start with 'gs://'")
+        return False
+
+    bucket_name, blob_name = job.gcs_uri.replace("gs://", "").split("/", 1)
+    file_extension = os.path.splitext(blob_name)[1].lower()
+    if file_extension not in (".mp3", ".wav"):
+        logging.error(
+            f"Unsupported file format: {file_extension}. Only .mp3 and .wav are supported."
+        )
+        return False
+
+    try:
+        with span("lookup", job.correlation_id):
+            job.blob = get_storage_client().bucket(bucket_name).get_blob(blob_name)
+            if job.blob is None:
+                raise FileNotFoundError(f"{job.gcs_uri} does not exist")
+            logging.info(f"Processing file from GCS: {job.gcs_uri} ({job.blob.size} bytes)")
+            job.cache_key = content_key(job.blob, STT_BACKEND)
+            job.text = cached_transcription(job.cache_key)
+        if job.text is not None:
+            logging.info(f"Cache hit for {job.gcs_uri}, skipping download")
+    except Exception as e:
+        logging.error(f"An error occurred processing {job.gcs_uri}: {e}")
+        job.text = f"Error processing file: {e}"
+    return True
+
+
+def decode_job(job):
+    """Stream the job's blob through the decoder into its chunk queue.
+
+    Nothing is written to disk, and decoding blocks once
+    STT_DECODE_AHEAD_CHUNKS chunks are waiting for recognition.
+    """
+    # Decode straight to the format the recognizer wants, so no second
+    # conversion of the audio is needed before recognition
+    sample_rate = get_recognizer(STT_BACKEND).sample_rate
+    vad = (
+        VoiceActivityFilter(sample_rate, STT_VAD_OFFSET_DB, STT_VAD_FLOOR_DB)
+        if STT_VAD
+        else None
+    )
+    start = time.perf_counter()
+    reader = None
+    try:
+        with job.blob.open("rb", chunk_size=STT_READ_CHUNK_BYTES) as blob_reader, closing(
+            decode_stream(reader := TimedReader(blob_reader), sample_rate, STT_FRAME_MS)
+        ) as frames:
+            # Silence is dropped before chunking so chunks are full of speech
+            speech = vad.filter(frames) if vad else frames
+            for chunk in stream_chunks(
+                speech, sample_rate, STT_CHUNK_MAX_MS, STT_SILENCE_OFFSET_DB
+            ):
+                job.chunks.put(chunk)
+        if vad:
+            logging.info(
+                f"VAD removed {vad.removed_seconds:.1f}s of non-speech from {job.gcs_uri}"
+            )
+            if vad.removed_fraction > VAD_SUSPECT_FRACTION:
+                # More likely a recording the filter misjudged than one
+                # that is almost all silence; keep its transcript uncached
+                job.cacheable = False
+                logging.warning(
+                    f"VAD removed {vad.removed_fraction:.0%} of {job.gcs_uri}; "
+                    f"its transcript will not be cached"
+                )
     except Exception as e:
-        logging.error(f"An error occurred processing {gcs_uri}: {e}")
-        text = f"Error processing file: {e}"
+        job.chunks.put(e)
     finally:
-        # Clean up temporary files
+        job.chunks.put(END_OF_AUDIO)
+        # Reads run in ffmpeg's feeder thread, so the split is approximate;
+        # decode time also includes waiting for recognition to catch up
+        download = reader.seconds if reader else 0.0
+        observe("download", download, job.correlation_id)
+        observe("decode", time.perf_counter() - start - download, job.correlation_id)
+
+
+def decode_stage(decode_queue, recognize_queue):
+    """Fetch and decode jobs ahead of recognition, one job at a time.
+
+    A job is handed to the recognize stage before it is decoded, so its first
+    chunks are recognized while the rest are still downloading, and the next
+    job starts decoding while the current one's last chunks are recognized.
+    """
+    while (job := decode_queue.get()) is not None:
+        if shutting_down or not job.connection.is_open:
+            # Not started yet; hand it back to the broker for another consumer
+            job.settle(ack=False, requeue=True)
+            continue
+
         try:
-            if os.path.exists(local_audio_path):
-                os.remove(local_audio_path)
-            if wav_path != local_audio_path and os.path.exists(
-                wav_path
-            ):  # Check if wav_path is different and exists
-                os.remove(wav_path)
-            os.rmdir(temp_dir)
-            logging.info(f"Cleaned up temporary files for {gcs_uri}")
+            if not prepare_job(job):
+                job.settle(ack=True)
+                continue
         except Exception as e:
-            logging.error(f"Error cleaning up temporary files for {gcs_uri}: {e}")
+            logging.error(f"Failed to process message {job.body}: {e}")
+            # Retry once on a later delivery, then drop it to avoid a poison loop
+            job.settle(ack=False, requeue=not job.method.redelivered)
+            continue
 
-    # Publish the text to RabbitMQ
-    message = json.dumps(
-        {"file": gcs_uri, "transcription": text, "user_id": user_id}
-    )  # Use gcs_uri in the message
-    channel.basic_publish(exchange="", routing_key=TRANSCRIPTIONS_QUEUE, body=message)
+        recognize_queue.put(job)
+        if job.text is None:
+            decode_job(job)
+    recognize_queue.put(None)
 
-    return text
 
+def recognize_stage(recognize_queue, executor):
+    """Recognize decoded jobs in order, then publish and ack them."""
+    while (job := recognize_queue.get()) is not None:
+        if job.text is None:
+            try:
+                with span("recognize", job.correlation_id):
+                    job.text, complete = transcribe_chunked(
+                        job.iter_chunks(),
+                        job.gcs_uri,
+                        executor,
+                        on_text=job.publish_partial if STT_STREAM_PARTIALS else None,
+                    )
+                if complete and job.cacheable:
+                    cache_transcription(job.cache_key, job.text)
+            except Exception as e:
+                logging.error(f"An error occurred processing {job.gcs_uri}: {e}")
+                job.text = f"Error processing file: {e}"
+                job.discard_chunks()
 
-def callback(ch, method, properties, body):
-    message = json.loads(body)
-    logging.info(f"Received message: {message}")
-    file_path = message.get("file")
-    user_id = message.get("user_id")
-    if file_path:
-        transcription = mp3_to_text(file_path, ch, user_id)
-        logging.info(f"Processed file: {file_path}\nTranscription: {transcription}")
+        logging.info(
+            f"[{job.correlation_id}] Processed file: {job.gcs_uri}\nTranscription: {job.text}"
+        )
+        job.finish()
 
 
-while True:
-    connection, channel = connect_rabbitmq()
-    try:
-        logging.info("Waiting for messages. To exit press CTRL+C")
-        channel.basic_consume(
-            queue=AUDIO_FILES_QUEUE, on_message_callback=callback, auto_ack=True
-        )
-        channel.start_consuming()
-    except pika.exceptions.AMQPConnectionError:
-        logging.error("Lost connection to RabbitMQ, reconnecting...")
-        time.sleep(5)
+def request_shutdown(signum, frame):
+    global shutting_down
+    if not shutting_down:
+        logging.info(f"Received signal {signum}, finishing in-flight jobs...")
+    shutting_down = True
+
+
+def consume():
+    """Consume audio jobs in this process until a shutdown signal arrives.
+
+    The connection thread only moves messages; decoding and recognition run on
+    their own stage threads, connected by bounded queues. The message is acked
+    only after its transcription has been published, and jobs that were
+    prefetched but not started before shutdown are requeued.
+    """
+    global in_flight_jobs
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+    executor = ThreadPoolExecutor(max_workers=STT_WORKERS)
+    # Load the backend before jobs arrive; both stages use it
+    get_recognizer(STT_BACKEND)
+
+    while not shutting_down:
+        connection, channel = connect_rabbitmq()
+        in_flight_jobs = 0
+        # Prefetch already bounds the jobs waiting to be decoded
+        decode_queue = queue.Queue()
+        recognize_queue = queue.Queue(maxsize=1)
+        stages = [
+            threading.Thread(target=decode_stage, args=(decode_queue, recognize_queue)),
+            threading.Thread(target=recognize_stage, args=(recognize_queue, executor)),
+        ]
+        for stage in stages:
+            stage.start()
+
+        def on_message(ch, method, properties, body):
+            global in_flight_jobs
+            in_flight_jobs += 1
+            decode_queue.put(Job(connection, ch, method, body))
+
+        try:
+            channel.basic_qos(prefetch_count=STT_PREFETCH)
+            consumer_tag = channel.basic_consume(
+                queue=AUDIO_FILES_QUEUE, on_message_callback=on_message
+            )
+            logging.info("Waiting for messages. To exit press CTRL+C")
+            while not shutting_down:
+                connection.process_data_events(time_limit=1)
+
+            # Stop deliveries, then keep serving the connection until every
+            # received job has been acked or requeued
+            channel.basic_cancel(consumer_tag)
+            while in_flight_jobs:
+                connection.process_data_events(time_limit=1)
+            connection.close()
+        except pika.exceptions.AMQPConnectionError:
+            logging.error("Lost connection to RabbitMQ, reconnecting...")
+            time.sleep(5)
+        finally:
+            decode_queue.put(None)
+            for stage in stages:
+                stage.join()
+
+    executor.shutdown()
+
+
+def supervise():
+    """Run STT_PROCESSES consumer processes, restarting any that die."""
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    workers = {}
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Values left by a previous run of the pool would be counted again
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            os.remove(os.path.join(metrics_dir, name))
+    serve(STT_METRICS_PORT)
+
+    def start(index):
+        process = multiprocessing.Process(target=consume, name=f"stt-worker-{index}")
+        process.start()
+        workers[index] = process
+
+    for index in range(STT_PROCESSES):
+        start(index)
+    logging.info(f"Started {STT_PROCESSES} consumer processes")
+
+    while not shutting_down:
+        time.sleep(1)
+        for index, process in list(workers.items()):
+            if not process.is_alive() and not shutting_down:
+                logging.warning(
+                    f"{process.name} exited with code {process.exitcode}, restarting"
+                )
+                if metrics_dir:
+                    multiprocess.mark_process_dead(process.pid)
+                start(index)
+
+    # SIGTERM lets each consumer finish its in-flight job and requeue the rest
+    for process in workers.values():
+        process.terminate()
+    for process in workers.values():
+        process.join()
+    logging.info("All consumer processes stopped")
+
+
+if __name__ == "__main__":
+    if STT_PROCESSES > 1:
+        supervise()
+    else:
+        serve(STT_METRICS_PORT)
+        consume()
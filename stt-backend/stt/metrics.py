@@ -0,0 +1,84 @@
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "stt_stage_seconds",
+    "Time spent on one job in each pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+JOBS = Counter("stt_jobs_total", "Audio jobs finished, by outcome", ["outcome"])
+QUEUE_LAG = Gauge(
+    "stt_queue_lag_seconds",
+    "How long the most recently started job waited in the audio queue",
+    multiprocess_mode="mostrecent",
+)
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+def observe(stage, seconds, correlation_id=None):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    logging.info(f"[{correlation_id}] {stage} took {seconds:.3f}s")
+
+
+@contextmanager
+def span(stage, correlation_id=None):
+    """Time the enclosed block as one `stage` of the job `correlation_id`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, correlation_id)
+
+
+class TimedReader:
+    """Wraps a binary reader to measure the time spent waiting on reads.
+
+    Downloads are streamed straight into the decoder, so this is how the
+    download share of the decode stage is told apart.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        try:
+            return self.reader.read(size)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+
+def serve(port):
+    """Expose /metrics on `port`; 0 disables the exporter.
+
+    With PROMETHEUS_MULTIPROC_DIR set, the metrics of every consumer process
+    are aggregated, so the supervisor can serve them for the whole pool.
+    """
+    if not port:
+        return
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    logging.info(f"Serving metrics on port {port}")
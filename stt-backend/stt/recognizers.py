@@ -0,0 +1,196 @@
+import functools
+import logging
+import os
+import time
+import zlib
+from typing import List, NamedTuple, Optional
+
+import speech_recognition as sr
+from pydub import AudioSegment
+
+from audio import normalize
+
+
+class Recognition(NamedTuple):
+    """Result for one segment.
+
+    `text` is the recognized text, "" when the segment contains no speech, or
+    None when recognition failed. `payload_bytes` is the size of what was sent
+    to the engine.
+    """
+
+    text: Optional[str]
+    payload_bytes: int
+
+
+class Recognizer:
+    """Speech recognition backend.
+
+    Each backend declares the PCM `sample_rate` it wants and the
+    `payload_format` it hands to the engine; audio is decoded straight to that
+    rate as 16-bit mono. Backends that benefit from batched inference raise
+    `batch_size`.
+    """
+
+    name = "base"
+    batch_size = 1
+    payload_format = "pcm"
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+
+    def transcribe(self, segment: AudioSegment) -> Recognition:
+        raise NotImplementedError
+
+    def transcribe_batch(self, segments: List[AudioSegment]) -> List[Recognition]:
+        return [self.transcribe(segment) for segment in segments]
+
+
+class FlacAudioData(sr.AudioData):
+    """AudioData that FLAC-encodes itself once and reuses the payload."""
+
+    def __init__(self, frame_data, sample_rate, sample_width):
+        super().__init__(frame_data, sample_rate, sample_width)
+        self._flac_data = None
+
+    def get_flac_data(self, convert_rate=None, convert_width=None):
+        if convert_rate not in (None, self.sample_rate) or convert_width not in (
+            None,
+            self.sample_width,
+        ):
+            return super().get_flac_data(convert_rate, convert_width)
+        if self._flac_data is None:
+            self._flac_data = super().get_flac_data()
+        return self._flac_data
+
+
+class GoogleRecognizer(Recognizer):
+    """Google Web Speech API through SpeechRecognition's free endpoint.
+
+    Segments are sent as FLAC, roughly half the size of the same PCM.
+    """
+
+    name = "google"
+    payload_format = "flac"
+
+    def __init__(self, sample_rate: int = 16000, retries: int = 2):
+        super().__init__(sample_rate)
+        self.retries = retries
+
+    def transcribe(self, segment):
+        segment = normalize(segment, self.sample_rate)
+        audio_data = FlacAudioData(
+            segment.raw_data, segment.frame_rate, segment.sample_width
+        )
+        payload_bytes = len(audio_data.get_flac_data())
+        recognizer = sr.Recognizer()
+
+        for attempt in range(self.retries + 1):
+            try:
+                return Recognition(recognizer.recognize_google(audio_data), payload_bytes)
+            except sr.UnknownValueError:
+                return Recognition("", payload_bytes)
+            except sr.RequestError as e:
+                logging.warning(f"Recognition attempt {attempt + 1} failed for chunk: {e}")
+        return Recognition(None, payload_bytes)
+
+
+class WhisperRecognizer(Recognizer):
+    """Offline Whisper model running on the local CPU.
+
+    Segments are transcribed `batch_size` at a time in a single forward pass.
+    Needs `transformers` and `torch`, which are not part of the default image.
+    torch already spreads one batch over every core, so run it with
+    STT_WORKERS=1.
+    """
+
+    name = "whisper"
+    payload_format = "float32"
+
+    def __init__(self, model: str = "openai/whisper-base", batch_size: int = 8):
+        # Whisper models are trained on 16 kHz audio only
+        super().__init__(16000)
+        try:
+            import numpy
+            from transformers import pipeline
+        except ImportError as e:
+            raise RuntimeError(
+                "The whisper backend requires `transformers` and `torch` to be installed"
+            ) from e
+
+        self.np = numpy
+        self.batch_size = batch_size
+        self.pipeline = pipeline("automatic-speech-recognition", model=model, device="cpu")
+        logging.info(f"Loaded local recognition model {model}")
+
+    def _to_input(self, segment):
+        segment = normalize(segment, self.sample_rate)
+        samples = self.np.frombuffer(segment.raw_data, dtype=self.np.int16)
+        return {
+            "raw": samples.astype(self.np.float32) / 32768.0,
+            "sampling_rate": segment.frame_rate,
+        }
+
+    def transcribe(self, segment):
+        return self.transcribe_batch([segment])[0]
+
+    def transcribe_batch(self, segments):
+        inputs = [self._to_input(segment) for segment in segments]
+        try:
+            outputs = self.pipeline(inputs, batch_size=self.batch_size)
+        except Exception as e:
+            logging.error(f"Local recognition failed for batch of {len(segments)}: {e}")
+            return [Recognition(None, item["raw"].nbytes) for item in inputs]
+        return [
+            Recognition(output["text"].strip(), item["raw"].nbytes)
+            for output, item in zip(outputs, inputs)
+        ]
+
+
+class FakeRecognizer(Recognizer):
+    """Deterministic offline backend for tests and benchmarks.
+
+    The text depends only on the segment's audio, and an optional fixed delay
+    simulates recognition latency.
+    """
+
+    name = "fake"
+
+    def __init__(self, sample_rate: int = 16000, latency_ms: int = 0):
+        super().__init__(sample_rate)
+        self.latency_ms = latency_ms
+
+    def transcribe(self, segment):
+        segment = normalize(segment, self.sample_rate)
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if segment.rms == 0:
+            return Recognition("", len(segment.raw_data))
+        checksum = zlib.crc32(segment.raw_data)
+        return Recognition(
+            f"segment {len(segment)}ms {checksum:08x}", len(segment.raw_data)
+        )
+
+
+BACKENDS = {
+    GoogleRecognizer.name: lambda: GoogleRecognizer(
+        sample_rate=int(os.getenv("STT_SAMPLE_RATE", "16000")),
+        retries=int(os.getenv("STT_CHUNK_RETRIES", "2")),
+    ),
+    WhisperRecognizer.name: lambda: WhisperRecognizer(
+        model=os.getenv("STT_WHISPER_MODEL", "openai/whisper-base"),
+        batch_size=int(os.getenv("STT_BATCH_SIZE", "8")),
+    ),
+    FakeRecognizer.name: lambda: FakeRecognizer(
+        sample_rate=int(os.getenv("STT_SAMPLE_RATE", "16000")),
+        latency_ms=int(os.getenv("STT_FAKE_LATENCY_MS", "0")),
+    ),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_recognizer(name: str) -> Recognizer:
+    """Build the backend called `name` once per process."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown STT backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,121 @@
+from collections import deque
+
+import numpy as np
+
+# Decoded audio is always 16-bit mono PCM
+FULL_SCALE = 32768.0
+
+
+class VoiceActivityFilter:
+    """Drops non-speech audio from a stream of 16-bit mono PCM frames.
+
+    Each frame is split into short windows whose energy is computed in one
+    vectorized pass. Like the chunker's pauses, the threshold is relative:
+    windows louder than the recording's level so far minus `offset_db` count
+    as speech, so a quietly recorded meeting is not mistaken for silence.
+    Windows under `floor_db` (dBFS) never count. `padding_ms` of audio is
+    kept on both sides of every speech window, across frame boundaries, so
+    word onsets and tails survive.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        offset_db: float = 20.0,
+        floor_db: float = -70.0,
+        window_ms: int = 30,
+        padding_ms: int = 300,
+    ):
+        self.sample_rate = sample_rate
+        self.offset_db = offset_db
+        self.floor_db = floor_db
+        self.total_samples = 0
+        # Sum of the mean power of every window so far, for the running level
+        self._power_sum = 0.0
+        self._windows = 0
+        self.window_size = sample_rate * window_ms // 1000
+        self.padding = max(1, -(-padding_ms // window_ms))
+        self.removed_samples = 0
+        # Windows still to keep after speech at the end of the previous frame
+        self._hangover = 0
+        # Dropped windows at the end of the previous frame, re-emitted as
+        # leading padding if the next frame starts with speech
+        self._held = deque(maxlen=self.padding)
+        # Samples that did not fill a whole window yet
+        self._remainder = np.empty(0, dtype=np.int16)
+
+    @property
+    def removed_seconds(self) -> float:
+        return self.removed_samples / self.sample_rate
+
+    @property
+    def removed_fraction(self) -> float:
+        return self.removed_samples / self.total_samples if self.total_samples else 0.0
+
+    def _level(self, power):
+        return 10 * np.log10(power / FULL_SCALE**2 + 1e-12)
+
+    def process(self, frame: bytes) -> bytes:
+        """Return the speech (plus padding) contained in `frame`."""
+        samples = np.concatenate((self._remainder, np.frombuffer(frame, dtype=np.int16)))
+        self.total_samples += len(samples) - len(self._remainder)
+        count = len(samples) // self.window_size
+        self._remainder = samples[count * self.window_size :]
+        if count == 0:
+            return b""
+
+        windows = samples[: count * self.window_size].reshape(count, self.window_size)
+        power = np.mean(windows.astype(np.float64) ** 2, axis=1)
+        self._power_sum += float(power.sum())
+        self._windows += count
+        running_level = self._level(self._power_sum / self._windows)
+        threshold = max(self.floor_db, running_level - self.offset_db)
+        speech = self._level(power) > threshold
+
+        # A full convolution trimmed to the centre, since mode="same" returns
+        # the kernel's length for frames with fewer windows than the kernel
+        kernel = np.ones(2 * self.padding + 1, dtype=int)
+        spread = np.convolve(speech.astype(int), kernel, mode="full")
+        keep = spread[self.padding : self.padding + count] > 0
+        keep[: self._hangover] = True
+
+        output = []
+        if speech.any():
+            lead = self.padding - int(np.argmax(speech))
+            if lead > 0 and self._held:
+                held = list(self._held)[-lead:]
+                output.extend(held)
+                self.removed_samples -= len(held) * self.window_size
+            last_speech = count - 1 - int(np.argmax(speech[::-1]))
+            self._hangover = max(0, last_speech + self.padding - (count - 1))
+        else:
+            self._hangover = max(0, self._hangover - count)
+
+        output.append(windows[keep].tobytes())
+        self.removed_samples += int((~keep).sum()) * self.window_size
+
+        kept_indices = np.flatnonzero(keep)
+        if len(kept_indices):
+            self._held.clear()
+            trailing = windows[kept_indices[-1] + 1 :]
+        else:
+            trailing = windows
+        self._held.extend(window.tobytes() for window in trailing[-self.padding :])
+
+        return b"".join(output)
+
+    def flush(self) -> bytes:
+        """Return the samples left over at the end of the stream."""
+        tail = self._remainder.tobytes() if self._hangover else b""
+        if not tail:
+            self.removed_samples += len(self._remainder)
+        self._remainder = np.empty(0, dtype=np.int16)
+        return tail
+
+    def filter(self, frames):
+        """Apply the filter to an iterable of frames, skipping empty output."""
+        for frame in frames:
+            if speech := self.process(frame):
+                yield speech
+        if tail := self.flush():
+            yield tail